@@ -0,0 +1,43 @@
+"""uppercase event codes
+
+Revision ID: 244fe2d4592a
+Revises: 3e7b0c5d9f16
+Create Date: 2026-10-17 21:05:43.118902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '244fe2d4592a'
+down_revision = '3e7b0c5d9f16'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Codes are looked up uppercased, the ones derived from the event name
+    # are mixed case. The events whose code collides with an older one once
+    # uppercased get a new code, like in 3e7b0c5d9f16.
+    op.execute(
+        """
+        UPDATE event
+        SET code = upper(substr(md5(random()::text || id::text), 1, 10))
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (
+                    PARTITION BY upper(code) ORDER BY inserted_at, id
+                ) AS n
+                FROM event
+            ) AS codes
+            WHERE n > 1
+        )
+        """
+    )
+    op.execute("UPDATE event SET code = upper(code) WHERE code <> upper(code)")
+
+
+def downgrade():
+    # The original case is lost, and uppercased codes still work
+    pass
@@ -0,0 +1,43 @@
+"""add unique event code index
+
+Revision ID: 3e7b0c5d9f16
+Revises: 8d41b7e6c2a9
+Create Date: 2026-10-17 16:40:52.731406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e7b0c5d9f16'
+down_revision = '8d41b7e6c2a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Codes derived from the event name could collide, the oldest event keeps
+    # its code and the others get a new one (10 characters, so they can't
+    # collide with the 8 character generated codes either)
+    op.execute(
+        """
+        UPDATE event
+        SET code = upper(substr(md5(random()::text || id::text), 1, 10))
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (
+                    PARTITION BY code ORDER BY inserted_at, id
+                ) AS n
+                FROM event
+            ) AS codes
+            WHERE n > 1
+        )
+        """
+    )
+    with op.get_context().autocommit_block():
+        op.create_index('ix_event_code', 'event', ['code'], unique=True, postgresql_concurrently=True)
+
+
+def downgrade():
+    op.drop_index('ix_event_code', table_name='event')
@@ -0,0 +1,37 @@
+"""backfill question followup_count
+
+Revision ID: 5f3c9a1d7e42
+Revises: 2b60fd7acf22
+Create Date: 2026-10-17 10:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f3c9a1d7e42'
+down_revision = '2b60fd7acf22'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # followup_count is now the source of truth for question listings, so
+    # recompute it once from the actual follow-up rows.
+    op.execute(sa.text("""
+        UPDATE question
+        SET followup_count = coalesce(followups.count, 0)
+        FROM question AS q
+        LEFT JOIN (
+            SELECT parent_id, count(*) AS count
+            FROM question
+            WHERE parent_id IS NOT NULL
+            GROUP BY parent_id
+        ) AS followups ON followups.parent_id = q.id
+        WHERE question.id = q.id
+    """))
+
+
+def downgrade():
+    pass
@@ -0,0 +1,34 @@
+"""add question listing indexes
+
+Revision ID: 8d41b7e6c2a9
+Revises: 5f3c9a1d7e42
+Create Date: 2026-10-17 13:02:17.554021
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41b7e6c2a9'
+down_revision = '5f3c9a1d7e42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Build without locking out writes on a live question table
+    with op.get_context().autocommit_block():
+        op.create_index('ix_question_parent_id', 'question', ['parent_id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_question_event_parent_like_count', 'question', ['event_id', 'parent_id', 'like_count', 'id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_question_event_parent_inserted_at', 'question', ['event_id', 'parent_id', 'inserted_at', 'id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_question_event_top_level_like_count', 'question', ['event_id', 'like_count', 'id'], unique=False, postgresql_where=sa.text('parent_id IS NULL'), postgresql_concurrently=True)
+        op.create_index('ix_question_event_top_level_inserted_at', 'question', ['event_id', 'inserted_at', 'id'], unique=False, postgresql_where=sa.text('parent_id IS NULL'), postgresql_concurrently=True)
+
+
+def downgrade():
+    op.drop_index('ix_question_event_top_level_inserted_at', table_name='question')
+    op.drop_index('ix_question_event_top_level_like_count', table_name='question')
+    op.drop_index('ix_question_event_parent_inserted_at', table_name='question')
+    op.drop_index('ix_question_event_parent_like_count', table_name='question')
+    op.drop_index('ix_question_parent_id', table_name='question')
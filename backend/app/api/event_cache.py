@@ -0,0 +1,57 @@
+from uuid import UUID
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel.sql.expression import SelectOfScalar
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.db import async_engine
+from app.models import Event, EventPublic
+
+# Events hardly change while they run, and every attendee request needs
+# theirs. Entries are dropped when their event is edited on this worker, the
+# edits made on the other workers show up after the TTL.
+events: TTLCache[UUID, EventPublic] = TTLCache(
+    settings.EVENT_CACHE_TTL_SECONDS, settings.EVENT_CACHE_SIZE
+)
+# Attendees join by code, the busiest way in. Codes never change.
+event_codes: TTLCache[str, EventPublic] = TTLCache(
+    settings.EVENT_CACHE_TTL_SECONDS, settings.EVENT_CACHE_SIZE
+)
+
+
+async def _find(statement: SelectOfScalar[Event]) -> EventPublic | None:
+    # From the primary whatever the request reads from: the schedule is
+    # enforced from the cache, a lagging replica could put an event there as
+    # it was before its last edit
+    async with AsyncSession(async_engine) as session:
+        found = (await session.exec(statement)).first()
+    return EventPublic.model_validate(found) if found else None
+
+
+async def get_event(event_id: UUID) -> EventPublic | None:
+    """The event, from the cache or else the database."""
+    event = events.get(event_id)
+    if event is None:
+        event = await _find(select(Event).where(Event.id == event_id))
+        if event is None:
+            return None
+        events.put(event_id, event)
+    return event
+
+
+async def get_event_by_code(code: str) -> EventPublic | None:
+    """The event with the join code, from the cache or else the database."""
+    event = event_codes.get(code)
+    if event is None:
+        event = await _find(select(Event).where(Event.code == code))
+        if event is None:
+            return None
+        event_codes.put(code, event)
+    return event
+
+
+def invalidate(event: Event) -> None:
+    events.pop(event.id)
+    event_codes.pop(event.code)
@@ -0,0 +1,138 @@
+import asyncio
+import time
+from bisect import bisect_left, insort
+from collections.abc import Callable
+from typing import Any
+from uuid import UUID
+
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.db import async_engine
+from app.models import Question, QuestionPublic
+
+# Ascending keys rank like the "likes, desc" listing: most liked first, ties
+# broken by the larger id
+RankKey = tuple[int, int, UUID]
+
+
+def rank_key(question: QuestionPublic) -> RankKey:
+    return (-question.like_count, -question.id.int, question.id)
+
+
+class Board:
+    """The top-level questions of one event, ranked by likes."""
+
+    def __init__(self) -> None:
+        self.questions: dict[UUID, QuestionPublic] = {}
+        self.ranking: list[RankKey] = []
+        self.loaded_at = time.monotonic()
+        # Changes made while the board was loading, replayed on top of it
+        self.pending: list[Callable[[Board], None]] = []
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def upsert(self, question: QuestionPublic) -> None:
+        self.remove(question.id)
+        self.questions[question.id] = question
+        insort(self.ranking, rank_key(question))
+
+    def update(self, question_id: UUID, values: dict[str, Any]) -> None:
+        question = self.questions.get(question_id)
+        if question is not None:
+            self.upsert(question.model_copy(update=values))
+
+    def remove(self, question_id: UUID) -> None:
+        question = self.questions.pop(question_id, None)
+        if question is not None:
+            del self.ranking[bisect_left(self.ranking, rank_key(question))]
+
+    def top(self, limit: int) -> list[QuestionPublic]:
+        return [self.questions[key[2]] for key in self.ranking[:limit]]
+
+
+class Leaderboard:
+    """
+    In-memory ranking of the questions of every event that is being read.
+
+    A board is loaded from the database on first read, then kept up to date
+    by the question routes of this worker. Changes made on other workers only
+    show up once it's reloaded, after `ttl` seconds.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._boards: dict[UUID, Board] = {}
+        self._loading: dict[UUID, tuple[Board, asyncio.Task[Board]]] = {}
+
+    def is_loaded(self, event_id: UUID) -> bool:
+        board = self._boards.get(event_id)
+        return board is not None and not self._expired(board)
+
+    async def top(self, event_id: UUID, limit: int) -> tuple[list[QuestionPublic], int]:
+        """The `limit` most liked questions and the number of questions."""
+        board = self._boards.get(event_id)
+        if board is None or self._expired(board):
+            board = await self._load(event_id)
+        return board.top(limit), len(board)
+
+    def upsert(self, question: Question) -> None:
+        if question.parent_id is None:
+            public = QuestionPublic.model_validate(question)
+            self._apply(question.event_id, lambda board: board.upsert(public))
+
+    def update(self, event_id: UUID, question_id: UUID, **values: Any) -> None:
+        self._apply(event_id, lambda board: board.update(question_id, values))
+
+    def remove(self, event_id: UUID, question_id: UUID) -> None:
+        self._apply(event_id, lambda board: board.remove(question_id))
+
+    def clear(self) -> None:
+        self._boards.clear()
+
+    def _expired(self, board: Board) -> bool:
+        return time.monotonic() - board.loaded_at > self.ttl
+
+    def _apply(self, event_id: UUID, change: Callable[[Board], None]) -> None:
+        board = self._boards.get(event_id)
+        if board is not None:
+            change(board)
+        if loading := self._loading.get(event_id):
+            loading[0].pending.append(change)
+
+    async def _load(self, event_id: UUID) -> Board:
+        # Concurrent readers of a cold board share a single query
+        if event_id in self._loading:
+            _, task = self._loading[event_id]
+        else:
+            board = Board()
+            task = asyncio.create_task(self._fill(event_id, board))
+            self._loading[event_id] = (board, task)
+            task.add_done_callback(lambda _: self._loading.pop(event_id, None))
+        return await asyncio.shield(task)
+
+    async def _fill(self, event_id: UUID, board: Board) -> Board:
+        statement = select(Question).where(
+            Question.event_id == event_id, col(Question.parent_id).is_(None)
+        )
+        async with AsyncSession(async_engine) as session:
+            questions = (await session.exec(statement)).all()
+        for question in questions:
+            board.upsert(QuestionPublic.model_validate(question))
+        for change in board.pending:
+            change(board)
+        board.pending.clear()
+
+        # Boards nobody read for a while are only dropped here, no need for
+        # a timer
+        for expired_id in [
+            id for id, expired in self._boards.items() if self._expired(expired)
+        ]:
+            del self._boards[expired_id]
+        self._boards[event_id] = board
+        return board
+
+
+leaderboard = Leaderboard(settings.LEADERBOARD_TTL_SECONDS)
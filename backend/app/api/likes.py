@@ -0,0 +1,125 @@
+import asyncio
+import logging
+from uuid import UUID
+
+from sqlalchemy import Integer, Uuid, column, values
+from sqlmodel import col, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.db import async_engine
+from app.models import Question
+
+from .leaderboard import leaderboard
+from .websockets.connection import ConnectionManager, manager
+from .websockets.messages import question_liked
+
+logger = logging.getLogger(__name__)
+
+SHUTDOWN_FLUSH_ATTEMPTS = 3
+SHUTDOWN_FLUSH_RETRY_SECONDS = 1.0
+
+
+class LikeAggregator:
+    """
+    Collects likes in memory and writes them behind, once per tick.
+
+    Every flush is one bulk UPDATE for all the liked questions and one
+    `question_liked` broadcast per question, however many clicks it got.
+    Increments are relative, so workers flushing independently add up.
+    """
+
+    def __init__(self, manager: ConnectionManager, flush_interval: float):
+        self.manager = manager
+        self.flush_interval = flush_interval
+        self._pending: dict[UUID, tuple[UUID, int]] = {}
+        self._task: asyncio.Task[None] | None = None
+        self._stopping = asyncio.Event()
+
+    async def startup(self) -> None:
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def shutdown(self) -> None:
+        if self._task:
+            # Not cancelled: a flush in progress would lose the likes it took
+            self._stopping.set()
+            await self._task
+            self._task = None
+        # Last chance for the pending likes, give the database a few tries
+        # rather than failing the shutdown
+        for attempt in range(1, SHUTDOWN_FLUSH_ATTEMPTS + 1):
+            try:
+                await self.flush()
+                return
+            except Exception:
+                logger.exception(f"Error flushing likes on shutdown, attempt {attempt}")
+                if attempt < SHUTDOWN_FLUSH_ATTEMPTS:
+                    await asyncio.sleep(SHUTDOWN_FLUSH_RETRY_SECONDS)
+        likes = sum(n for _, n in self._pending.values())
+        logger.error(f"Dropping {likes} likes that could not be flushed")
+        self._pending = {}
+
+    def add(self, event_id: UUID, question_id: UUID) -> int:
+        """Record a like, returns the likes of the question not flushed yet."""
+        _, likes = self._pending.get(question_id, (event_id, 0))
+        self._pending[question_id] = (event_id, likes + 1)
+        return likes + 1
+
+    def pending(self, question_id: UUID) -> int:
+        return self._pending.get(question_id, (None, 0))[1]
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.flush_interval)
+                # Stopping, shutdown flushes what's left
+                return
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing likes: {e}")
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+
+        likes = values(column("id", Uuid), column("likes", Integer), name="likes").data(
+            [(question_id, n) for question_id, (_, n) in pending.items()]
+        )
+        statement = (
+            update(Question)
+            .where(col(Question.id) == likes.c.id)
+            .values(like_count=Question.like_count + likes.c.likes)
+            .returning(
+                col(Question.id),
+                col(Question.event_id),
+                col(Question.like_count),
+                col(Question.followup_count),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        committed = False
+        try:
+            async with AsyncSession(async_engine) as session:
+                rows = (await session.exec(statement)).all()  # type: ignore
+                await session.commit()
+                committed = True
+        finally:
+            if not committed:
+                # Failed or cancelled, put the likes back for the next flush
+                for question_id, (event_id, n) in pending.items():
+                    _, likes_since = self._pending.get(question_id, (event_id, 0))
+                    self._pending[question_id] = (event_id, n + likes_since)
+
+        for question_id, event_id, like_count, followup_count in rows:
+            leaderboard.update(event_id, question_id, like_count=like_count)
+            await self.manager.broadcast(
+                str(event_id), question_liked(question_id, like_count, followup_count)
+            )
+
+
+like_aggregator = LikeAggregator(manager, settings.LIKE_FLUSH_INTERVAL_MS / 1000)
@@ -0,0 +1,86 @@
+import hashlib
+from dataclasses import dataclass
+from uuid import UUID
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+from .websockets.connection import manager
+
+# Event, parent, sort_by, order, limit and with_count of a first page
+ListingKey = tuple[UUID, UUID | None, str | None, str, int, bool]
+
+
+@dataclass(frozen=True)
+class Listing:
+    """A serialized question listing and its ETag."""
+
+    body: bytes
+    etag: str
+
+    @classmethod
+    def of(cls, body: bytes) -> "Listing":
+        # From the content and not the version, so that every worker gives the
+        # same listing the same ETag
+        return cls(body, f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"')
+
+    def matches(self, if_none_match: str | None) -> bool:
+        if not if_none_match:
+            return False
+        # If-None-Match compares weakly, W/ tags match their strong version
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or self.etag in tags
+
+
+class ListingCache:
+    """
+    Serialized first pages of the question listings that are being polled.
+
+    Every question change bumps the version of its event, which invalidates
+    the cached listings of the event. The changes of this worker, and the
+    ones broadcast by any worker, bump right away, the others (edits and
+    deletions on other workers) show up after `ttl` seconds.
+    """
+
+    def __init__(self, ttl: float, size: int):
+        self._versions: dict[UUID, int] = {}
+        self._entries: TTLCache[ListingKey, tuple[int, Listing]] = TTLCache(ttl, size)
+
+    @property
+    def ttl(self) -> float:
+        return self._entries.ttl
+
+    @ttl.setter
+    def ttl(self, ttl: float) -> None:
+        self._entries.ttl = ttl
+
+    def version(self, event_id: UUID) -> int:
+        return self._versions.get(event_id, 0)
+
+    def bump(self, event_id: UUID) -> None:
+        self._versions[event_id] = self.version(event_id) + 1
+
+    def get(self, key: ListingKey) -> Listing | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        version, listing = entry
+        if version != self.version(key[0]):
+            self._entries.pop(key)
+            return None
+        return listing
+
+    def put(self, key: ListingKey, version: int, listing: Listing) -> None:
+        """Cache a listing read at `version`, unless the event changed since."""
+        if version == self.version(key[0]):
+            self._entries.put(key, (version, listing))
+
+    def clear(self) -> None:
+        self._versions.clear()
+        self._entries.clear()
+
+
+listing_cache = ListingCache(
+    settings.LISTING_CACHE_TTL_SECONDS, settings.LISTING_CACHE_SIZE
+)
+manager.on_broadcast(lambda event_id: listing_cache.bump(UUID(event_id)))
@@ -1,52 +1,65 @@
 from uuid import UUID
 
 from fastapi import APIRouter, HTTPException
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import func, select
 
-from app.api.deps import CurrentUser, SessionDep
+from app.api import event_cache
+from app.api.deps import AsyncSessionDep, CurrentUser
 from app.models import Event, EventCreate, EventPublic, EventsPublic, EventUpdate
 from app.utils import generate_event_code
 
 router = APIRouter(prefix="/events", tags=["events"])
 
+EVENT_CODE_ATTEMPTS = 3
+
 
 @router.get("/", response_model=EventsPublic)
-async def list_events(session: SessionDep, current_user: CurrentUser):
+async def list_events(session: AsyncSessionDep, current_user: CurrentUser):
     """List all events"""
     # First get count
     count_statement = (
         select(func.count()).select_from(Event).where(Event.owner_id == current_user.id)
     )
-    count = session.exec(count_statement).one()
+    count = (await session.exec(count_statement)).one()
 
     # Then get events with explicit column selection
     statement = select(Event).where(Event.owner_id == current_user.id)
-    events = session.exec(statement).all()
+    events = (await session.exec(statement)).all()
     return EventsPublic(data=events, count=count)
 
 
 @router.post("/", response_model=EventPublic)
 async def new_event(
-    session: SessionDep, current_user: CurrentUser, event_in: EventCreate
+    session: AsyncSessionDep, current_user: CurrentUser, event_in: EventCreate
 ):
     """Create new event"""
-    event = Event(
-        **event_in.model_dump(),
-        owner_id=current_user.id,
-        code=generate_event_code(event_in.name),
-    )
-    session.add(event)
-    session.commit()
-    session.refresh(event)
+    # Draw another code on the rare collision with an existing one
+    for attempt in range(EVENT_CODE_ATTEMPTS):
+        event = Event(
+            **event_in.model_dump(),
+            owner_id=current_user.id,
+            code=generate_event_code(),
+        )
+        session.add(event)
+        try:
+            await session.commit()
+            break
+        except IntegrityError as e:
+            await session.rollback()
+            constraint = getattr(getattr(e.orig, "diag", None), "constraint_name", None)
+            if constraint != "ix_event_code" or attempt + 1 == EVENT_CODE_ATTEMPTS:
+                raise
+    await session.refresh(event)
     return event
 
 
 @router.put("/{id}/edit", response_model=EventPublic)
 async def edit_event(
-    id: UUID, session: SessionDep, current_user: CurrentUser, event_in: EventUpdate
+    id: UUID, session: AsyncSessionDep, current_user: CurrentUser, event_in: EventUpdate
 ):
     """Edit event form"""
-    event = session.exec(select(Event).where(Event.id == id)).first()
+    event = (await session.exec(select(Event).where(Event.id == id))).first()
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     if event.owner_id != current_user.id:
@@ -55,24 +68,35 @@ async def edit_event(
     for key, value in event_in.model_dump(exclude_unset=True).items():
         setattr(event, key, value)
 
-    session.commit()
-    session.refresh(event)
+    await session.commit()
+    await session.refresh(event)
+    event_cache.invalidate(event)
+    return event
+
+
+@router.get("/by-code/{code}", response_model=EventPublic)
+async def get_event_by_code(code: str) -> EventPublic:
+    """Get event by join code"""
+    # Codes are uppercase, attendees type them however they like
+    event = await event_cache.get_event_by_code(code.strip().upper())
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
     return event
 
 
 @router.get("/{id}", response_model=EventPublic)
-async def get_event(id: UUID, session: SessionDep):
+async def get_event(id: UUID):
     """Get event"""
-    event = session.get(Event, id)
+    event = await event_cache.get_event(id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     return event
 
 
 @router.get("/{id}/stats")
-async def event_stats(id: int, session: SessionDep):
+async def event_stats(id: int, session: AsyncSessionDep):
     """Get event statistics"""
-    event = session.get(Event, id)
+    event = await session.get(Event, id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     return HTTPException(status_code=200, detail="Event stats not implemented")
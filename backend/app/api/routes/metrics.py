@@ -0,0 +1,21 @@
+import secrets
+
+from fastapi import APIRouter, Header, HTTPException, Response
+
+from app.core.config import settings
+from app.core.metrics import render
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics(authorization: str | None = Header(None)) -> Response:
+    """
+    Metrics in the Prometheus text format.
+    """
+    if settings.METRICS_TOKEN and not secrets.compare_digest(
+        authorization or "", f"Bearer {settings.METRICS_TOKEN}"
+    ):
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    content, media_type = render()
+    return Response(content, media_type=media_type)
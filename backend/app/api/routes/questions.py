@@ -1,11 +1,25 @@
+import base64
+import binascii
+import json
+from datetime import datetime, timezone
+from typing import Any
 from uuid import UUID
 
-from fastapi import APIRouter, HTTPException, Query
-from sqlmodel import desc, func, select
-
-from app.api.deps import SessionDep
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Mapped
+from sqlmodel import col, desc, func, select, update
+from sqlmodel.sql.expression import SelectOfScalar
+
+from app.api.deps import AsyncSessionDep, ReadSessionDep
+from app.api.event_cache import get_event
+from app.api.leaderboard import leaderboard
+from app.api.likes import like_aggregator
+from app.api.listings import Listing, listing_cache
+from app.core.config import settings
+from app.core.middleware import RECENT_WRITE_COOKIE
 from app.models import (
-    Event,
+    EventPublic,
     Question,
     QuestionCreate,
     QuestionPublic,
@@ -14,98 +28,219 @@ from app.models import (
 )
 
 from ..websockets.connection import manager
+from ..websockets.messages import (
+    new_question,
+    question_deleted,
+    question_edited,
+    question_liked,
+    question_updated,
+)
 
 router = APIRouter(prefix="/questions", tags=["questions"])
 
 
-async def verify_event(session: SessionDep, event_id: UUID) -> Event:
-    event = session.get(Event, event_id)
+async def verify_event(event_id: UUID) -> EventPublic:
+    event = await get_event(event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     return event
 
 
+async def verify_event_open(event_id: UUID) -> EventPublic:
+    """The event, if it takes questions, changes and likes right now."""
+    event = await verify_event(event_id)
+    now = datetime.now(timezone.utc)
+    if event.started_at and now < as_utc(event.started_at):
+        raise HTTPException(status_code=403, detail="Event has not started")
+    if event.expired_at and now >= as_utc(event.expired_at):
+        raise HTTPException(status_code=403, detail="Event has ended")
+    return event
+
+
+def as_utc(value: datetime) -> datetime:
+    # Timestamps are stored without a time zone, in UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
 async def get_question_or_404(
-    session: SessionDep, event_id: UUID, question_id: UUID
+    session: AsyncSessionDep, event_id: UUID, question_id: UUID
 ) -> Question:
-    question = session.get(Question, question_id)
+    question = await session.get(Question, question_id)
     if not question or question.event_id != event_id:
         raise HTTPException(status_code=404, detail="Question not found")
     return question
 
 
+def encode_cursor(question: Question, sort_by: str | None, order: str) -> str:
+    """Opaque position of `question` in a listing, to continue after it."""
+    if sort_by == "likes":
+        value: Any = question.like_count
+    else:
+        value = question.inserted_at.isoformat()
+    cursor = json.dumps([sort_by, order, value, str(question.id)])
+    return base64.urlsafe_b64encode(cursor.encode()).decode()
+
+
+def decode_cursor(cursor: str, sort_by: str | None, order: str) -> tuple[Any, UUID]:
+    try:
+        cursor_sort_by, cursor_order, value, id = json.loads(
+            base64.urlsafe_b64decode(cursor.encode())
+        )
+        if (cursor_sort_by, cursor_order) != (sort_by, order):
+            raise ValueError("Cursor of another listing order")
+        if sort_by != "likes":
+            value = datetime.fromisoformat(value)
+        elif not isinstance(value, int):
+            raise ValueError("Invalid like count")
+        if not isinstance(id, str):
+            raise ValueError("Invalid id")
+        return value, UUID(id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 def build_questions_query(
-    event_id: UUID, parent_id: UUID | None, sort_by: str | None, order: str
-):
+    event_id: UUID,
+    parent_id: UUID | None,
+    sort_by: str | None,
+    order: str,
+    after: tuple[Any, UUID] | None = None,
+) -> SelectOfScalar[Question]:
     query = select(Question).where(Question.event_id == event_id)
 
     if parent_id is not None:
         query = query.where(Question.parent_id == parent_id)
     else:
-        query = query.where(Question.parent_id.is_(None))
+        query = query.where(col(Question.parent_id).is_(None))
 
+    # id breaks ties so the order is stable, both directions match the indexes
+    sort_column: Mapped[Any]
     if sort_by == "likes":
-        query = query.order_by(
-            desc(Question.like_count) if order == "desc" else Question.like_count
-        )
+        sort_column = col(Question.like_count)
     else:
-        query = query.order_by(
-            desc(Question.inserted_at) if order == "desc" else Question.inserted_at
-        )
+        sort_column = col(Question.inserted_at)
+    if order == "desc":
+        query = query.order_by(desc(sort_column), desc(col(Question.id)))
+    else:
+        query = query.order_by(sort_column, col(Question.id))
+
+    # Keyset pagination: seek past the last row of the previous page
+    if after is not None:
+        key = tuple_(sort_column, col(Question.id))
+        query = query.where(key < after if order == "desc" else key > after)
 
     return query
 
 
-@router.get("/events/{event_id}/questions", response_model=QuestionsPublic)
+@router.get(
+    "/events/{event_id}/questions",
+    response_model=QuestionsPublic,
+    responses={304: {"description": "Not modified since the If-None-Match ETag"}},
+)
 async def list_questions(
+    request: Request,
     event_id: UUID,
-    session: SessionDep,
+    session: ReadSessionDep,
     sort_by: str | None = Query(None, enum=["created_at", "likes"]),
     order: str | None = Query("desc", enum=["asc", "desc"]),
     parent_id: UUID | None = None,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: str | None = None,
+    with_count: bool = True,
+    if_none_match: str | None = Header(None),
 ):
-    await verify_event(session, event_id)
+    order = order or "desc"
+    # First pages are what pollers read, unchanged ones are served from memory.
+    # Not to clients that just wrote: the cached listings can come from a
+    # replica that hasn't caught up with their write yet.
+    cached = cursor is None and RECENT_WRITE_COOKIE not in request.cookies
+    key = (event_id, parent_id, sort_by, order, limit, with_count)
+    listing = listing_cache.get(key) if cached else None
+    if listing is None:
+        version = listing_cache.version(event_id)
+        listing = Listing.of(
+            await read_questions(
+                session, event_id, sort_by, order, parent_id, limit, cursor, with_count
+            )
+        )
+        if cached:
+            listing_cache.put(key, version, listing)
 
-    # Build and execute query
-    query = build_questions_query(event_id, parent_id, sort_by, order)
-    questions = session.exec(query).all()
+    # Clients revalidate every time, and get a body only if it changed
+    headers = {"ETag": listing.etag, "Cache-Control": "no-cache"}
+    if listing.matches(if_none_match):
+        return Response(status_code=304, headers=headers)
+    return Response(listing.body, media_type="application/json", headers=headers)
 
-    # Get total count
-    count_statement = (
-        select(func.count()).select_from(Question).where(Question.event_id == event_id)
-    )
-    if parent_id is not None:
-        count_statement = count_statement.where(Question.parent_id == parent_id)
-    else:
-        count_statement = count_statement.where(Question.parent_id.is_(None))
-    count = session.exec(count_statement).one()
 
-    # Update followup counts
-    for question in questions:
-        followup_count = session.exec(
+async def read_questions(
+    session: ReadSessionDep,
+    event_id: UUID,
+    sort_by: str | None,
+    order: str,
+    parent_id: UUID | None,
+    limit: int,
+    cursor: str | None,
+    with_count: bool,
+) -> bytes:
+    await verify_event(event_id)
+    after = decode_cursor(cursor, sort_by, order) if cursor else None
+
+    # Build and execute query, one extra row tells if there is a next page
+    query = build_questions_query(event_id, parent_id, sort_by, order, after)
+    questions = (await session.exec(query.limit(limit + 1))).all()
+    next_cursor = None
+    if len(questions) > limit:
+        questions = questions[:limit]
+        next_cursor = encode_cursor(questions[-1], sort_by, order)
+
+    # Get total count, the only part that grows with the event
+    count = None
+    if with_count:
+        count_statement = (
             select(func.count())
             .select_from(Question)
-            .where(Question.parent_id == question.id, Question.event_id == event_id)
-        ).one()
-        question.followup_count = followup_count
+            .where(Question.event_id == event_id)
+        )
+        if parent_id is not None:
+            count_statement = count_statement.where(Question.parent_id == parent_id)
+        else:
+            count_statement = count_statement.where(col(Question.parent_id).is_(None))
+        count = (await session.exec(count_statement)).one()
+
+    # followup_count is denormalized and maintained by create/delete, so the
+    # listing never needs a per-question count query.
+    listing = QuestionsPublic(data=questions, count=count, next_cursor=next_cursor)
+    return listing.model_dump_json().encode()
+
 
+@router.get("/events/{event_id}/questions/top", response_model=QuestionsPublic)
+async def top_questions(
+    event_id: UUID,
+    limit: int = Query(10, ge=1, le=100),
+) -> QuestionsPublic:
+    """Most liked top-level questions, served from the in-memory leaderboard"""
+    if not leaderboard.is_loaded(event_id):
+        await verify_event(event_id)
+    questions, count = await leaderboard.top(event_id, limit)
     return QuestionsPublic(data=questions, count=count)
 
 
 @router.post("/events/{event_id}/questions", response_model=QuestionPublic)
 async def create_question(
     event_id: UUID,
-    session: SessionDep,
+    session: AsyncSessionDep,
     question_in: QuestionCreate,
     user_name: str,
     attendee_identifier: str,
     parent_id: UUID | None = None,
 ):
-    await verify_event(session, event_id)
+    await verify_event_open(event_id)
 
     if parent_id:
         parent = await get_question_or_404(session, event_id, parent_id)
-        parent.followup_count += 1
+        # Increment in SQL so concurrent follow-ups don't overwrite each other
+        parent.followup_count = Question.followup_count + 1
 
     question = Question(
         **question_in.model_dump(),
@@ -115,32 +250,22 @@ async def create_question(
         attendee_identifier=attendee_identifier,
     )
     session.add(question)
-    session.commit()
-    session.refresh(question)
+    await session.commit()
+    await session.refresh(question)
+    listing_cache.bump(event_id)
+    if parent_id:
+        await session.refresh(parent)
+        leaderboard.update(event_id, parent_id, followup_count=parent.followup_count)
+    else:
+        leaderboard.upsert(question)
 
     # Broadcast updates
     if parent_id:
         await manager.broadcast(
-            str(event_id),
-            {
-                "type": "question_updated",
-                "data": {
-                    "id": str(parent_id),
-                    "followup_count": parent.followup_count,
-                },
-            },
+            str(event_id), question_updated(parent_id, parent.followup_count)
         )
 
-    await manager.broadcast(
-        str(event_id),
-        {
-            "type": "new_question",
-            "data": {
-                **question.model_dump(),
-                "userName": user_name,
-            },
-        },
-    )
+    await manager.broadcast(str(event_id), new_question(question))
     return question
 
 
@@ -148,10 +273,11 @@ async def create_question(
 async def update_question(
     event_id: UUID,
     id: UUID,
-    session: SessionDep,
+    session: AsyncSessionDep,
     question_in: QuestionUpdate,
     attendee_identifier: str,
 ):
+    await verify_event_open(event_id)
     question = await get_question_or_404(session, event_id, id)
 
     if question.attendee_identifier != attendee_identifier:
@@ -162,13 +288,17 @@ async def update_question(
     for key, value in question_in.model_dump(exclude_unset=True).items():
         setattr(question, key, value)
 
-    session.commit()
-    session.refresh(question)
+    await session.commit()
+    await session.refresh(question)
+    listing_cache.bump(event_id)
+    leaderboard.upsert(question)
+
+    await manager.broadcast(str(event_id), question_edited(question))
     return question
 
 
 @router.get("/events/{event_id}/questions/{id}", response_model=QuestionPublic)
-async def get_question(event_id: UUID, id: UUID, session: SessionDep):
+async def get_question(event_id: UUID, id: UUID, session: ReadSessionDep):
     return await get_question_or_404(session, event_id, id)
 
 
@@ -176,9 +306,10 @@ async def get_question(event_id: UUID, id: UUID, session: SessionDep):
 async def delete_question(
     event_id: UUID,
     id: UUID,
-    session: SessionDep,
+    session: AsyncSessionDep,
     attendee_identifier: str,
 ):
+    await verify_event_open(event_id)
     question = await get_question_or_404(session, event_id, id)
 
     if question.attendee_identifier != attendee_identifier:
@@ -186,38 +317,65 @@ async def delete_question(
             status_code=403, detail="Not authorized to delete this question"
         )
 
-    session.delete(question)
-    session.commit()
+    followup_count = None
+    if question.parent_id:
+        statement = (
+            update(Question)
+            .where(col(Question.id) == question.parent_id)
+            .values(followup_count=Question.followup_count - 1)
+            .returning(col(Question.followup_count))
+        )
+        result = await session.exec(statement)  # type: ignore
+        followup_count = result.scalar_one_or_none()
+
+    parent_id = question.parent_id
+    await session.delete(question)
+    await session.commit()
+    listing_cache.bump(event_id)
+    if parent_id is None:
+        leaderboard.remove(event_id, id)
+    elif followup_count is not None:
+        leaderboard.update(event_id, parent_id, followup_count=followup_count)
+
+    await manager.broadcast(str(event_id), question_deleted(id, parent_id))
+    if parent_id and followup_count is not None:
+        await manager.broadcast(
+            str(event_id), question_updated(parent_id, followup_count)
+        )
     return {"message": "Question deleted"}
 
 
-@router.post("/events/{event_id}/questions/{id}/like")
-async def like_question(event_id: UUID, id: UUID, session: SessionDep):
-    question = await get_question_or_404(session, event_id, id)
-
-    question.like_count += 1
-
-    # Get followup count
-    followup_count = session.exec(
-        select(func.count())
-        .select_from(Question)
-        .where(Question.parent_id == question.id, Question.event_id == event_id)
-    ).one()
-    question.followup_count = followup_count
+@router.post("/events/{event_id}/questions/{id}/like", response_model=QuestionPublic)
+async def like_question(event_id: UUID, id: UUID, session: AsyncSessionDep):
+    await verify_event_open(event_id)
+    if settings.LIKE_FLUSH_INTERVAL_MS:
+        # Written and broadcast with the next flush of the aggregator
+        question = await get_question_or_404(session, event_id, id)
+        like_count = question.like_count + like_aggregator.add(event_id, id)
+        # On the leaderboard of this worker right away. The listings are read
+        # from the database, their cache is bumped by the broadcast of the flush
+        leaderboard.update(event_id, id, like_count=like_count)
+        return QuestionPublic.model_validate(
+            question, update={"like_count": like_count}
+        )
 
-    session.commit()
-    session.refresh(question)
+    # A single atomic increment: no read-modify-write, so concurrent likes are
+    # never lost and the row lock is held only for the statement
+    statement = (
+        update(Question)
+        .where(col(Question.id) == id, col(Question.event_id) == event_id)
+        .values(like_count=Question.like_count + 1)
+        .returning(Question)
+    )
+    question = (await session.exec(statement)).scalar_one_or_none()  # type: ignore
+    if not question:
+        raise HTTPException(status_code=404, detail="Question not found")
+    await session.commit()
+    listing_cache.bump(event_id)
+    leaderboard.upsert(question)
 
     await manager.broadcast(
         str(event_id),
-        {
-            "type": "question_liked",
-            "data": {
-                "id": str(id),
-                "like_count": question.like_count,
-                "likes": question.like_count,
-                "followup_count": question.followup_count,
-            },
-        },
+        question_liked(id, question.like_count, question.followup_count),
     )
     return question
@@ -5,6 +5,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import col, delete, func, select
 
 from app import crud
+from app.api import user_cache
 from app.api.deps import (
     CurrentUser,
     SessionDep,
@@ -93,6 +94,7 @@ def update_user_me(
     current_user.sqlmodel_update(user_data)
     session.add(current_user)
     session.commit()
+    user_cache.invalidate(current_user.id)
     session.refresh(current_user)
     return current_user
 
@@ -114,6 +116,7 @@ def update_password_me(
     current_user.hashed_password = hashed_password
     session.add(current_user)
     session.commit()
+    user_cache.invalidate(current_user.id)
     return Message(message="Password updated successfully")
 
 
@@ -134,10 +137,12 @@ def delete_user_me(session: SessionDep, current_user: CurrentUser) -> Any:
         raise HTTPException(
             status_code=403, detail="Super users are not allowed to delete themselves"
         )
-    statement = delete(Item).where(col(Item.owner_id) == current_user.id)
+    user_id = current_user.id
+    statement = delete(Item).where(col(Item.owner_id) == user_id)
     session.exec(statement)  # type: ignore
     session.delete(current_user)
     session.commit()
+    user_cache.invalidate(user_id)
     return Message(message="User deleted successfully")
 
 
@@ -204,6 +209,7 @@ def update_user(
             )
 
     db_user = crud.update_user(session=session, db_user=db_user, user_in=user_in)
+    user_cache.invalidate(user_id)
     return db_user
 
 
@@ -225,4 +231,5 @@ def delete_user(
     session.exec(statement)  # type: ignore
     session.delete(user)
     session.commit()
+    user_cache.invalidate(user_id)
     return Message(message="User deleted successfully")
@@ -1,18 +1,95 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from typing import Any
+from uuid import UUID
 
-from ..websockets.connection import manager
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, status
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.deps import get_current_active_superuser
+from app.api.event_cache import get_event
+from app.core.config import settings
+from app.core.db import async_engine
+from app.models import EventConnections, EventsConnections, Question
+
+from ..websockets.connection import EventFull, manager
+from ..websockets.encodings import Frame, negotiate
+from ..websockets.messages import question_data, redirect
 
 router = APIRouter(tags=["websockets"])
 
 
+async def load_event_snapshot(event_id: UUID) -> dict[str, Any]:
+    """Every question of the event, the state the deltas apply to"""
+    statement = (
+        select(Question)
+        .where(Question.event_id == event_id)
+        .order_by(col(Question.inserted_at), col(Question.id))
+    )
+    # Shared by every client connecting meanwhile, so not bound to the
+    # session of any of them
+    async with AsyncSession(async_engine) as session:
+        questions = (await session.exec(statement)).all()
+    return {"questions": [question_data(question) for question in questions]}
+
+
+def shard_url(event_id: UUID) -> str | None:
+    """Base URL of the worker dedicated to the event, unless it's this one"""
+    url = settings.WS_EVENT_SHARDS.get(str(event_id))
+    if url is None or url == settings.WS_SHARD_URL:
+        return None
+    return url
+
+
 @router.websocket("/ws/events/{event_id}")
-async def websocket_endpoint(websocket: WebSocket, event_id: str):
+async def websocket_endpoint(
+    websocket: WebSocket,
+    event_id: UUID,
+    since: int | None = None,
+    epoch: str | None = None,
+) -> None:
+    """
+    Live updates of an event.
+
+    The first message is a `snapshot` of the event with the `epoch` and `seq`
+    it was taken at, followed by deltas numbered with `seq`. On reconnect,
+    pass `since` (the last `seq` received) and `epoch` to get only the deltas
+    missed, or a new snapshot if they are no longer available.
+
+    Clients of an event served by a dedicated worker get a `redirect` with the
+    `url` to connect to instead. Clients of a full event are closed with 1013.
+
+    Messages are JSON text frames, or MessagePack binary frames for clients
+    offering the `echoq.msgpack` subprotocol.
+    """
+    event = await get_event(event_id)
+    if not event:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    encoding, subprotocol = negotiate(websocket.scope.get("subprotocols", []))
     try:
-        await websocket.accept()
-        await manager.connect(websocket, event_id)
+        await websocket.accept(subprotocol=subprotocol)
+        if url := shard_url(event_id):
+            message = redirect(f"{url}{settings.API_V1_STR}/ws/events/{event_id}")
+            await websocket.send(Frame(message).send_message(encoding))
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+            return
+        try:
+            await manager.connect(
+                websocket,
+                str(event_id),
+                since=since,
+                epoch=epoch,
+                load_snapshot=lambda: load_event_snapshot(event_id),
+                encoding=encoding,
+            )
+        except EventFull:
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+            return
         while True:
             try:
                 data = await websocket.receive_text()
+                manager.touch(websocket, str(event_id))
                 if data == "ping":
                     await websocket.send_text("pong")
             except WebSocketDisconnect:
@@ -21,4 +98,21 @@ async def websocket_endpoint(websocket: WebSocket, event_id: str):
                 print(f"WebSocket error: {e}")
                 break
     finally:
-        manager.disconnect(websocket, event_id)
+        manager.disconnect(websocket, str(event_id))
+
+
+@router.get(
+    "/ws/stats",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=EventsConnections,
+)
+async def websocket_stats() -> EventsConnections:
+    """Live websocket connections of the worker serving the request, by event"""
+    stats = manager.stats()
+    return EventsConnections(
+        data=[
+            EventConnections(event_id=event_id, **gauges)
+            for event_id, gauges in stats.items()
+        ],
+        count=sum(gauges["connections"] for gauges in stats.values()),
+    )
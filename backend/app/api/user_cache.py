@@ -0,0 +1,32 @@
+from uuid import UUID
+
+from sqlalchemy.orm import make_transient_to_detached
+from sqlmodel import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models import User
+
+# Organizer dashboards poll with the same token over and over. Detached
+# copies, never handed out themselves, so no request can change them.
+users: TTLCache[str, User] = TTLCache(
+    settings.USER_CACHE_TTL_SECONDS, settings.USER_CACHE_SIZE
+)
+
+
+def get_user(session: Session, user_id: str | UUID) -> User | None:
+    """The user, from the cache or else the database, in `session`."""
+    cached = users.get(str(user_id))
+    if cached is not None:
+        # Attached as loaded, without a query
+        return session.merge(cached, load=False)
+    user = session.get(User, user_id)
+    if user is not None:
+        copy = User(**user.model_dump())
+        make_transient_to_detached(copy)
+        users.put(str(user_id), copy)
+    return user
+
+
+def invalidate(user_id: str | UUID) -> None:
+    users.pop(str(user_id))
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
+
+import psycopg
+from psycopg import sql
+
+logger = logging.getLogger(__name__)
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more. A question (content,
+# title and user name bounded in the model) stays under it even when every
+# character takes 4 bytes.
+NOTIFY_PAYLOAD_LIMIT = 7999
+
+
+class BroadcastBackend(ABC):
+    """
+    Carries serialized broadcast messages to every subscribed worker.
+
+    Each subscriber receives every published message as an
+    `(event_id, message)` tuple, including the ones it published itself.
+    """
+
+    def __init__(self) -> None:
+        self._queues: set[asyncio.Queue[tuple[str, str]]] = set()
+
+    async def connect(self) -> None:  # noqa: B027
+        pass
+
+    async def disconnect(self) -> None:  # noqa: B027
+        pass
+
+    @abstractmethod
+    async def publish(self, event_id: str, message: str) -> None: ...
+
+    def subscribe(self) -> AsyncIterator[tuple[str, str]]:
+        # Register the queue right away, so nothing published between this
+        # call and the first iteration is lost
+        queue: asyncio.Queue[tuple[str, str]] = asyncio.Queue()
+        self._queues.add(queue)
+        return self._iterate(queue)
+
+    async def _iterate(
+        self, queue: asyncio.Queue[tuple[str, str]]
+    ) -> AsyncIterator[tuple[str, str]]:
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._queues.discard(queue)
+
+    def _dispatch(self, event_id: str, message: str) -> None:
+        for queue in self._queues:
+            queue.put_nowait((event_id, message))
+
+
+class MemoryBackend(BroadcastBackend):
+    """Delivers within the current process, for a single worker."""
+
+    async def publish(self, event_id: str, message: str) -> None:
+        self._dispatch(event_id, message)
+
+
+class PostgresBackend(BroadcastBackend):
+    """Delivers to every worker and node through Postgres LISTEN/NOTIFY."""
+
+    def __init__(
+        self, conninfo: str, channel: str = "broadcast", reconnect_delay: float = 1
+    ) -> None:
+        super().__init__()
+        self.conninfo = conninfo
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self._publisher: psycopg.AsyncConnection | None = None
+        self._publish_lock = asyncio.Lock()
+        self._listener: asyncio.Task[None] | None = None
+        self._listening = asyncio.Event()
+
+    async def connect(self) -> None:
+        # Fresh primitives for the loop we're started on (app restarts in tests)
+        self._publish_lock = asyncio.Lock()
+        self._listening = asyncio.Event()
+        self._publisher = await psycopg.AsyncConnection.connect(
+            self.conninfo, autocommit=True
+        )
+        self._listener = asyncio.create_task(self._listen())
+        await self._listening.wait()
+
+    async def disconnect(self) -> None:
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._publisher:
+            await self._publisher.close()
+            self._publisher = None
+
+    async def publish(self, event_id: str, message: str) -> None:
+        # The message is JSON already, sent as is rather than escaped again
+        # inside an envelope. Event ids never contain a space.
+        payload = f"{event_id} {message}"
+        if len(payload.encode()) > NOTIFY_PAYLOAD_LIMIT:
+            logger.warning(
+                f"Broadcast for event {event_id} exceeds the NOTIFY payload "
+                "limit, delivering to this worker only"
+            )
+            self._dispatch(event_id, message)
+            return
+
+        async with self._publish_lock:
+            if self._publisher is None or self._publisher.closed:
+                self._publisher = await psycopg.AsyncConnection.connect(
+                    self.conninfo, autocommit=True
+                )
+            await self._publisher.execute(
+                "SELECT pg_notify(%s, %s)", (self.channel, payload)
+            )
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(
+                    self.conninfo, autocommit=True
+                ) as connection:
+                    await connection.execute(
+                        sql.SQL("LISTEN {}").format(sql.Identifier(self.channel))
+                    )
+                    self._listening.set()
+                    async for notify in connection.notifies():
+                        event_id, message = notify.payload.split(" ", 1)
+                        self._dispatch(event_id, message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Broadcast listener failed, reconnecting: {e}")
+                await asyncio.sleep(self.reconnect_delay)
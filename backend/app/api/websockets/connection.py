@@ -1,57 +1,451 @@
-import json
-from datetime import datetime
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable
+from dataclasses import dataclass, field
 from typing import Any
-from uuid import UUID
+from uuid import uuid4
 
-from fastapi import WebSocket
+import orjson
+from fastapi import WebSocket, status
+from sqlalchemy import make_url
+
+from app.core.config import settings
+from app.core.metrics import (
+    WS_BROADCAST_DURATION,
+    WS_CONNECTIONS,
+    WS_DROPPED_CONNECTIONS,
+    WS_FANOUT_DURATION,
+)
+
+from .backends import BroadcastBackend, MemoryBackend, PostgresBackend
+from .encodings import JSON, Encoding, Frame
+
+logger = logging.getLogger(__name__)
+
+# Sent instead of the dropped backlog to a client that fell behind, it should
+# reload the event state
+RESYNC = Frame({"type": "resync"})
+# Sent to idle clients every heartbeat interval
+HEARTBEAT = Frame({"type": "heartbeat"})
+
+
+class EventFull(Exception):
+    """The event already has as many clients as this worker takes for it."""
+
+
+@dataclass(eq=False)
+class Connection:
+    websocket: WebSocket
+    # ASGI send messages, shared with the other sockets of the same encoding
+    queue: asyncio.Queue[dict[str, Any]]
+    encoding: Encoding = JSON
+    sender: asyncio.Task[None] | None = None
+    # A resync is queued and not sent yet
+    lagging: bool = False
+    # Snapshot and replayed deltas, sent before anything from the queue
+    backlog: deque[dict[str, Any]] = field(default_factory=deque)
+    # When the client last sent anything, ping or otherwise
+    last_seen: float = field(default_factory=time.monotonic)
+
+
+@dataclass(eq=False)
+class EventStream:
+    # Sequence numbers are counted by each worker, and restart when the
+    # stream is dropped: a client can only resume within the same epoch
+    epoch: str
+    # Sequence number of the last delta of the event
+    seq: int
+    # The latest (seq, message) deltas, for clients resuming after a reconnect
+    deltas: deque[tuple[int, Frame]]
+    # Since when the event has no connections, None while it has some
+    idle_since: float | None = None
+    # Snapshot being loaded, shared by the clients connecting meanwhile
+    loading: asyncio.Task[tuple[int, Frame]] | None = None
+    # The last snapshot loaded and its seq, current until the next delta
+    snapshot: tuple[int, Frame] | None = None
+    # Bounds the sends in flight for the event
+    sending: asyncio.Semaphore = field(default_factory=asyncio.Semaphore)
 
 
 class ConnectionManager:
-    def __init__(self):
-        self._connections: dict[str, set[WebSocket]] = {}
+    def __init__(
+        self,
+        backend: BroadcastBackend | None = None,
+        send_timeout: float = settings.WS_SEND_TIMEOUT_SECONDS,
+        send_queue_size: int = settings.WS_SEND_QUEUE_SIZE,
+        replay_size: int = settings.WS_REPLAY_BUFFER_SIZE,
+        replay_retention: float = settings.WS_REPLAY_RETENTION_SECONDS,
+        heartbeat_interval: float = settings.WS_HEARTBEAT_INTERVAL_SECONDS,
+        idle_timeout: float = settings.WS_IDLE_TIMEOUT_SECONDS,
+        max_connections_per_event: int = settings.WS_MAX_CONNECTIONS_PER_EVENT,
+        event_send_concurrency: int = settings.WS_EVENT_SEND_CONCURRENCY,
+    ):
+        self._connections: dict[str, dict[WebSocket, Connection]] = {}
+        self._streams: dict[str, EventStream] = {}
+        self._backend = backend or MemoryBackend()
+        self._listener: asyncio.Task[None] | None = None
+        self._reaper: asyncio.Task[None] | None = None
+        self._closing: set[asyncio.Task[None]] = set()
+        self._on_broadcast: list[Callable[[str], None]] = []
+        self.send_timeout = send_timeout
+        self.send_queue_size = send_queue_size
+        self.replay_size = replay_size
+        self.replay_retention = replay_retention
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.max_connections_per_event = max_connections_per_event
+        self.event_send_concurrency = event_send_concurrency
+
+    async def startup(self) -> None:
+        await self._backend.connect()
+        self._listener = asyncio.create_task(self._listen(self._backend.subscribe()))
+        if self.heartbeat_interval:
+            self._reaper = asyncio.create_task(self._heartbeat())
+
+    async def shutdown(self) -> None:
+        for task in (self._reaper, self._listener):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._reaper = self._listener = None
+        await self._backend.disconnect()
 
-    async def connect(self, websocket: WebSocket, event_id: str):
+    async def connect(
+        self,
+        websocket: WebSocket,
+        event_id: str,
+        since: int | None = None,
+        epoch: str | None = None,
+        load_snapshot: Callable[[], Awaitable[Any]] | None = None,
+        encoding: Encoding = JSON,
+    ) -> None:
+        """
+        Subscribe `websocket` to the deltas of the event.
+
+        A client that was connected before passes the epoch and the sequence
+        number of the last delta it got, and is sent just the deltas it
+        missed. Any other client, or one too far behind, is first sent a
+        snapshot of the data returned by `load_snapshot`.
+
+        Raises `EventFull` if the event is at its connection cap.
+        """
+        self._check_capacity(event_id)
+        stream = self._stream(event_id)
+        backlog = None
+        if since is not None and epoch == stream.epoch:
+            backlog = self._replay(stream, since)
+        while backlog is None and load_snapshot is not None:
+            seq, snapshot = await self._snapshot(stream, load_snapshot)
+            replay = self._replay(stream, seq)
+            # None if the deltas since the snapshot overflowed the buffer
+            if replay is not None:
+                backlog = [snapshot, *replay]
+
+        # Nothing awaited since the backlog was taken, so no delta is missed
+        # or sent twice
+        self._check_capacity(event_id)
+        connection = Connection(
+            websocket=websocket,
+            queue=asyncio.Queue(maxsize=self.send_queue_size),
+            encoding=encoding,
+            backlog=deque(frame.send_message(encoding) for frame in backlog or []),
+        )
+        connection.sender = asyncio.create_task(
+            self._send(connection, event_id, stream.sending)
+        )
         if event_id not in self._connections:
-            self._connections[event_id] = set()
-        self._connections[event_id].add(websocket)
+            self._connections[event_id] = {}
+        self._connections[event_id][websocket] = connection
+        WS_CONNECTIONS.inc()
+        stream.idle_since = None
 
     def disconnect(self, websocket: WebSocket, event_id: str):
-        if event_id in self._connections:
-            self._connections[event_id].discard(websocket)
-            if not self._connections[event_id]:
-                del self._connections[event_id]
-
-    def _serialize(self, obj: Any) -> Any:
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        if isinstance(obj, UUID):
-            return str(obj)
-        if hasattr(obj, "model_dump"):
-            return obj.model_dump()
-        raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
-
-    async def broadcast(self, event_id: str, message: dict):
-        if event_id not in self._connections:
-            return
+        connection = self._remove(websocket, event_id)
+        if connection and connection.sender:
+            connection.sender.cancel()
+
+    def on_broadcast(self, callback: Callable[[str], None]) -> None:
+        """
+        Call `callback` with the event id of every broadcast delivered to this
+        worker, whichever worker sent it.
+        """
+        self._on_broadcast.append(callback)
+
+    def touch(self, websocket: WebSocket, event_id: str) -> None:
+        """Record that the client is alive, on anything received from it."""
+        connection = self._connections.get(event_id, {}).get(websocket)
+        if connection:
+            connection.last_seen = time.monotonic()
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Gauges of the connections of this worker, by event."""
+        return {
+            event_id: {
+                "connections": len(connections),
+                "lagging": sum(c.lagging for c in connections.values()),
+                "queued": sum(c.queue.qsize() for c in connections.values()),
+            }
+            for event_id, connections in self._connections.items()
+        }
+
+    def reap(self) -> int:
+        """
+        Drop the clients not heard from within the idle timeout, and send a
+        heartbeat to the others. Returns the number of clients dropped.
+        """
+        deadline = time.monotonic() - self.idle_timeout
+        reaped = 0
+        for event_id, connections in list(self._connections.items()):
+            for connection in list(connections.values()):
+                if connection.last_seen < deadline:
+                    WS_DROPPED_CONNECTIONS.labels("idle").inc()
+                    self._drop(connection, event_id)
+                    reaped += 1
+                    continue
+                try:
+                    heartbeat = HEARTBEAT.send_message(connection.encoding)
+                    connection.queue.put_nowait(heartbeat)
+                except asyncio.QueueFull:
+                    # Busy with deltas, those show the server is alive
+                    pass
+        if reaped:
+            logger.info(f"Dropped {reaped} idle websocket clients")
+        return reaped
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                self.reap()
+            except Exception as e:
+                logger.error(f"Error reaping websocket clients: {e}")
+
+    def _drop(self, connection: Connection, event_id: str) -> None:
+        self.disconnect(connection.websocket, event_id)
+        task = asyncio.create_task(self._close(connection.websocket))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
 
+    def _remove(self, websocket: WebSocket, event_id: str) -> Connection | None:
+        connections = self._connections.get(event_id)
+        if connections is None:
+            return None
+        connection = connections.pop(websocket, None)
+        if connection is not None:
+            WS_CONNECTIONS.dec()
+        if not connections:
+            del self._connections[event_id]
+            if stream := self._streams.get(event_id):
+                stream.idle_since = time.monotonic()
+        return connection
+
+    def _check_capacity(self, event_id: str) -> None:
+        cap = self.max_connections_per_event
+        if cap and len(self._connections.get(event_id, {})) >= cap:
+            WS_DROPPED_CONNECTIONS.labels("full").inc()
+            raise EventFull(event_id)
+
+    def _stream(self, event_id: str) -> EventStream:
+        now = time.monotonic()
+        for idle_id, idle in list(self._streams.items()):
+            if idle.idle_since is not None:
+                if now - idle.idle_since > self.replay_retention:
+                    del self._streams[idle_id]
+
+        stream = self._streams.get(event_id)
+        if stream is None:
+            # Idle until its first connection is registered
+            stream = EventStream(
+                epoch=uuid4().hex,
+                seq=0,
+                deltas=deque(maxlen=self.replay_size),
+                idle_since=now,
+                sending=asyncio.Semaphore(self.event_send_concurrency),
+            )
+            self._streams[event_id] = stream
+        elif stream.idle_since is not None:
+            # Not to be dropped while a client is loading its snapshot
+            stream.idle_since = now
+        return stream
+
+    def _replay(self, stream: EventStream, since: int) -> list[Frame] | None:
+        """The deltas after `since`, None if they aren't all buffered."""
+        if since > stream.seq:
+            return None
+        if since == stream.seq:
+            return []
+        if not stream.deltas or stream.deltas[0][0] > since + 1:
+            return None
+        return [frame for seq, frame in stream.deltas if seq > since]
+
+    async def _snapshot(
+        self, stream: EventStream, load_snapshot: Callable[[], Awaitable[Any]]
+    ) -> tuple[int, Frame]:
+        # No delta since the last snapshot, it is still current and encoded
+        if stream.snapshot is not None and stream.snapshot[0] == stream.seq:
+            return stream.snapshot
+        # Clients reconnecting all at once share a single load
+        if stream.loading is None:
+            stream.loading = asyncio.create_task(
+                self._load_snapshot(stream, load_snapshot)
+            )
+            stream.loading.add_done_callback(lambda _: setattr(stream, "loading", None))
+        return await asyncio.shield(stream.loading)
+
+    async def _load_snapshot(
+        self, stream: EventStream, load_snapshot: Callable[[], Awaitable[Any]]
+    ) -> tuple[int, Frame]:
+        # Taken before loading: the deltas after it are replayed on top of the
+        # snapshot, they are absolute so the ones it already has are harmless
+        seq = stream.seq
+        data = await load_snapshot()
+        stream.snapshot = (
+            seq,
+            Frame(
+                {"type": "snapshot", "epoch": stream.epoch, "seq": seq, "data": data}
+            ),
+        )
+        return stream.snapshot
+
+    async def broadcast(self, event_id: str, message: dict[str, Any]):
+        # Built by messages.py out of plain values, orjson takes care of the
+        # datetimes and UUIDs among them
         try:
-            json_message = json.dumps(message, default=self._serialize)
-        except Exception as e:
-            print(f"Error serializing message: {e}")
+            json_message = orjson.dumps(message).decode()
+        except TypeError:
+            logger.exception(f"Serializing a broadcast for event {event_id} failed")
             return
 
-        dead_connections = set()
-        for connection in list(self._connections[event_id]):
+        with WS_BROADCAST_DURATION.time():
+            if self._listener is None:
+                # Not started (outside the app lifespan), only this worker's
+                # sockets can be reached
+                self._send_local(event_id, json_message, message)
+                return
             try:
-                await connection.send_text(json_message)
+                await self._backend.publish(event_id, json_message)
             except Exception:
-                dead_connections.add(connection)
+                # The write behind it is committed already, failing here would
+                # make the client retry it. Other workers miss this one.
+                logger.exception(
+                    f"Publishing a broadcast for event {event_id} failed, "
+                    "delivering to this worker only"
+                )
+                self._send_local(event_id, json_message, message)
+
+    async def _listen(self, messages: AsyncIterator[tuple[str, str]]) -> None:
+        async for event_id, json_message in messages:
+            try:
+                self._send_local(event_id, json_message)
+            except Exception as e:
+                logger.error(f"Error delivering broadcast: {e}")
 
-        for dead in dead_connections:
-            self._connections[event_id].discard(dead)
+    def _send_local(
+        self,
+        event_id: str,
+        json_message: str,
+        message: dict[str, Any] | None = None,
+    ) -> None:
+        """
+        Number the broadcast and queue it for the sockets of the event.
 
-        if not self._connections[event_id]:
-            del self._connections[event_id]
+        `message` is the broadcast as a dict when it was sent by this worker,
+        it spares parsing `json_message` for the other encodings.
+        """
+        for callback in self._on_broadcast:
+            callback(event_id)
+        stream = self._streams.get(event_id)
+        if stream is None:
+            # Nobody connected lately, nothing to number or deliver
+            return
+
+        with WS_FANOUT_DURATION.time():
+            stream.seq += 1
+            # The seq is spliced into the serialized object, not re-encoded
+            frame = Frame.from_json(
+                f'{json_message[:-1]},"seq":{stream.seq}}}',
+                {**message, "seq": stream.seq} if message is not None else None,
+            )
+            stream.deltas.append((stream.seq, frame))
+
+            # Only enqueues: every socket has its own sender task, so the
+            # fan-out never waits on a slow client
+            for connection in list(self._connections.get(event_id, {}).values()):
+                try:
+                    connection.queue.put_nowait(frame.send_message(connection.encoding))
+                except asyncio.QueueFull:
+                    self._resync(connection, event_id)
+
+    def _resync(self, connection: Connection, event_id: str) -> None:
+        if connection.lagging:
+            # Didn't even catch up with the previous resync, give up on it
+            logger.info(f"Dropping slow websocket client of event {event_id}")
+            WS_DROPPED_CONNECTIONS.labels("slow").inc()
+            self._drop(connection, event_id)
+            return
+
+        while not connection.queue.empty():
+            connection.queue.get_nowait()
+        connection.queue.put_nowait(RESYNC.send_message(connection.encoding))
+        connection.lagging = True
+
+    async def _send(
+        self, connection: Connection, event_id: str, sending: asyncio.Semaphore
+    ) -> None:
+        while True:
+            if connection.backlog:
+                message = connection.backlog.popleft()
+            else:
+                message = await connection.queue.get()
+            if message is RESYNC.send_message(connection.encoding):
+                connection.lagging = False
+            # Sockets of the same event take turns, so the fan-out of a huge
+            # event interleaves with the other events instead of crowding
+            # them out of the loop
+            async with sending:
+                # Not wait_for: before Python 3.12 it can swallow the
+                # cancellation of disconnect() when the send completes at the
+                # same time
+                send = asyncio.ensure_future(connection.websocket.send(message))
+                try:
+                    done, _ = await asyncio.wait({send}, timeout=self.send_timeout)
+                except asyncio.CancelledError:
+                    send.cancel()
+                    raise
+            if not done:
+                send.cancel()
+                WS_DROPPED_CONNECTIONS.labels("timeout").inc()
+                break
+            if send.exception():
+                # Already gone
+                break
+
+        self._remove(connection.websocket, event_id)
+        await self._close(connection.websocket)
+
+    async def _close(self, websocket: WebSocket) -> None:
+        try:
+            await asyncio.wait_for(
+                websocket.close(code=status.WS_1013_TRY_AGAIN_LATER),
+                timeout=self.send_timeout,
+            )
+        except Exception:
+            pass
+
+
+def get_broadcast_backend() -> BroadcastBackend:
+    if settings.BROADCAST_BACKEND == "postgres":
+        url = make_url(str(settings.SQLALCHEMY_DATABASE_URI))
+        conninfo = url.set(drivername="postgresql").render_as_string(
+            hide_password=False
+        )
+        return PostgresBackend(conninfo)
+    return MemoryBackend()
 
 
-manager = ConnectionManager()
+manager = ConnectionManager(get_broadcast_backend())
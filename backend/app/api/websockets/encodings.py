@@ -0,0 +1,85 @@
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+import msgpack
+import orjson
+
+# What goes on the wire, text or binary frames
+Payload = str | bytes
+
+
+@dataclass(frozen=True)
+class Encoding:
+    name: str
+    dumps: Callable[[Any], Payload]
+
+
+def _dumps_json(message: Any) -> str:
+    return orjson.dumps(message).decode()
+
+
+def _dumps_msgpack(message: Any) -> bytes:
+    packed: bytes = msgpack.packb(message)
+    return packed
+
+
+JSON = Encoding("json", _dumps_json)
+MSGPACK = Encoding("msgpack", _dumps_msgpack)
+
+# By websocket subprotocol, in the Sec-WebSocket-Protocol header
+ENCODINGS = {"echoq.json": JSON, "echoq.msgpack": MSGPACK}
+
+
+def negotiate(subprotocols: list[str]) -> tuple[Encoding, str | None]:
+    """
+    The first of the subprotocols offered by the client that we support.
+
+    Clients that offer none of them get JSON text frames, with no subprotocol.
+    """
+    for subprotocol in subprotocols:
+        if subprotocol in ENCODINGS:
+            return ENCODINGS[subprotocol], subprotocol
+    return JSON, None
+
+
+class Frame:
+    """
+    A message to send to many sockets, encoded at most once per encoding.
+
+    The encoded payloads are kept as ready-made ASGI `websocket.send`
+    messages, so sending to one more socket costs no serialization at all.
+    """
+
+    __slots__ = ("_message", "_sends")
+
+    def __init__(self, message: dict[str, Any]) -> None:
+        self._message: dict[str, Any] | None = message
+        self._sends: dict[Encoding, dict[str, Any]] = {}
+
+    @classmethod
+    def from_json(cls, text: str, message: dict[str, Any] | None = None) -> "Frame":
+        """
+        A frame of an already serialized JSON message, sent as is.
+
+        `message` is the same message as a dict, if the caller has it. If not,
+        `text` is parsed only once a socket wants another encoding.
+        """
+        frame = cls.__new__(cls)
+        frame._message = message
+        frame._sends = {JSON: {"type": "websocket.send", "text": text}}
+        return frame
+
+    @property
+    def message(self) -> dict[str, Any]:
+        if self._message is None:
+            self._message = orjson.loads(self._sends[JSON]["text"])
+        return self._message
+
+    def send_message(self, encoding: Encoding) -> dict[str, Any]:
+        send = self._sends.get(encoding)
+        if send is None:
+            payload = encoding.dumps(self.message)
+            key = "bytes" if isinstance(payload, bytes) else "text"
+            send = self._sends[encoding] = {"type": "websocket.send", key: payload}
+        return send
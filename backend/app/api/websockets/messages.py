@@ -0,0 +1,64 @@
+from typing import Any
+from uuid import UUID
+
+from app.models import Question, QuestionPublic
+
+
+def question_data(question: Question | QuestionPublic) -> dict[str, Any]:
+    """What clients show of a question, never the attendee identifier."""
+    return {
+        "id": str(question.id),
+        "parent_id": str(question.parent_id) if question.parent_id else None,
+        "title": question.title,
+        "content": question.content,
+        "user_name": question.user_name,
+        "position": question.position,
+        "pinned": question.pinned,
+        "like_count": question.like_count,
+        "followup_count": question.followup_count,
+        "inserted_at": question.inserted_at.isoformat(),
+    }
+
+
+def new_question(question: Question) -> dict[str, Any]:
+    return {"type": "new_question", "data": question_data(question)}
+
+
+def question_updated(question_id: UUID, followup_count: int) -> dict[str, Any]:
+    return {
+        "type": "question_updated",
+        "data": {"id": str(question_id), "followup_count": followup_count},
+    }
+
+
+def question_edited(question: Question) -> dict[str, Any]:
+    """The whole question after an edit, clients replace what they show."""
+    return {"type": "question_updated", "data": question_data(question)}
+
+
+def question_deleted(question_id: UUID, parent_id: UUID | None) -> dict[str, Any]:
+    return {
+        "type": "question_deleted",
+        "data": {
+            "id": str(question_id),
+            "parent_id": str(parent_id) if parent_id else None,
+        },
+    }
+
+
+def question_liked(
+    question_id: UUID, like_count: int, followup_count: int
+) -> dict[str, Any]:
+    return {
+        "type": "question_liked",
+        "data": {
+            "id": str(question_id),
+            "like_count": like_count,
+            "followup_count": followup_count,
+        },
+    }
+
+
+def redirect(url: str) -> dict[str, Any]:
+    """Tells the client to connect to `url` instead."""
+    return {"type": "redirect", "url": url}
@@ -0,0 +1,97 @@
+"""
+Micro-benchmark of the websocket broadcast fan-out.
+
+    python -m app.benchmarks.broadcast
+
+Times a burst of broadcasts from `ConnectionManager.broadcast` to the last
+socket's send, for a growing number of recipients (half JSON, half
+MessagePack) on a no-op socket. Each message is encoded once per encoding,
+so the cost per recipient should stay flat as the recipients grow.
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from typing import Any
+from uuid import uuid4
+
+from app.api.websockets.connection import ConnectionManager
+from app.api.websockets.encodings import JSON, MSGPACK
+
+
+class NullWebSocket:
+    def __init__(self, messages: int, done: "Countdown") -> None:
+        self.remaining = messages
+        self.done = done
+
+    async def send(self, message: dict[str, Any]) -> None:  # noqa: ARG002
+        self.remaining -= 1
+        if self.remaining == 0:
+            self.done.count_down()
+
+
+class Countdown:
+    def __init__(self, count: int) -> None:
+        self.count = count
+        self.event = asyncio.Event()
+
+    def count_down(self) -> None:
+        self.count -= 1
+        if self.count == 0:
+            self.event.set()
+
+
+def sample_message() -> dict[str, Any]:
+    return {
+        "type": "new_question",
+        "data": {
+            "id": str(uuid4()),
+            "parent_id": None,
+            "title": None,
+            "content": "How does the broadcast scale with the audience? " * 4,
+            "user_name": "Benchmark",
+            "position": 0,
+            "pinned": False,
+            "like_count": 42,
+            "followup_count": 3,
+            "inserted_at": datetime.now().isoformat(),
+        },
+    }
+
+
+async def measure(recipients: int, messages: int) -> float:
+    """Seconds per message and recipient."""
+    manager = ConnectionManager(send_queue_size=messages + 1)
+    done = Countdown(recipients)
+    websockets: list[Any] = [NullWebSocket(messages, done) for _ in range(recipients)]
+    for i, websocket in enumerate(websockets):
+        await manager.connect(websocket, "event", encoding=MSGPACK if i % 2 else JSON)
+
+    message = sample_message()
+    start = time.perf_counter()
+    for _ in range(messages):
+        await manager.broadcast("event", message)
+    await done.event.wait()
+    elapsed = time.perf_counter() - start
+
+    for websocket in websockets:
+        manager.disconnect(websocket, "event")
+    return elapsed / (recipients * messages)
+
+
+async def main(recipients: list[int], messages: int) -> None:
+    print(f"{'recipients':>10}  {'per recipient':>14}")
+    for count in recipients:
+        seconds = await measure(count, messages)
+        print(f"{count:>10}  {seconds * 1_000_000:>11.2f} µs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--recipients", type=int, nargs="+", default=[10, 100, 1000, 10000]
+    )
+    parser.add_argument("--messages", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.recipients, args.messages))
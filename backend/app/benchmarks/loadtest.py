@@ -0,0 +1,310 @@
+"""
+Load test of a live event: attendees on the websocket, questions and likes
+over REST.
+
+    python -m app.benchmarks.loadtest --attendees 2000 --duration 60
+
+Runs against a server started separately (e.g. `fastapi run app/main.py`)
+and the Postgres of the settings. Without --event-id, logs in as the first
+superuser and creates an event to run on.
+
+Reports:
+- the latency from posting a question to each attendee receiving it
+- the throughput and latency of the REST requests
+- the statements the database ran meanwhile, from pg_stat_statements when
+  the extension is installed, or else transactions from pg_stat_database
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any
+from uuid import uuid4
+
+import httpx
+import msgpack
+import orjson
+import psycopg
+from sqlalchemy import make_url
+from websockets.asyncio.client import connect
+from websockets.typing import Subprotocol
+
+from app.core.config import settings
+
+MARKER = "loadtest"
+
+
+@dataclass
+class Stats:
+    # Seconds from posting a question to an attendee receiving it
+    broadcast_latencies: list[float] = field(default_factory=list)
+    # Seconds per request, by request name
+    request_latencies: dict[str, list[float]] = field(default_factory=dict)
+    errors: Counter[str] = field(default_factory=Counter)
+    messages: Counter[str] = field(default_factory=Counter)
+    connected: int = 0
+    # Send time of the questions posted, by marker in their content
+    posted: dict[str, float] = field(default_factory=dict)
+    question_ids: list[str] = field(default_factory=list)
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def decode(message: str | bytes) -> dict[str, Any]:
+    decoded: dict[str, Any]
+    if isinstance(message, bytes):
+        decoded = msgpack.unpackb(message)
+    else:
+        decoded = orjson.loads(message)
+    return decoded
+
+
+async def attendee(
+    ws_url: str,
+    encoding: str,
+    stats: Stats,
+    connecting: asyncio.Semaphore,
+    stop: asyncio.Event,
+) -> None:
+    try:
+        async with connecting:
+            websocket = await connect(
+                ws_url, subprotocols=[Subprotocol(f"echoq.{encoding}")], max_size=None
+            )
+    except Exception as e:
+        stats.errors[f"connect: {type(e).__name__}"] += 1
+        return
+
+    stats.connected += 1
+    async with websocket:
+        receiving = asyncio.ensure_future(receive(websocket, stats))
+        pinging = asyncio.ensure_future(ping(websocket))
+        await stop.wait()
+        receiving.cancel()
+        pinging.cancel()
+
+
+async def receive(websocket: Any, stats: Stats) -> None:
+    try:
+        async for raw in websocket:
+            received_at = time.perf_counter()
+            if raw == "pong":
+                continue
+            message = decode(raw)
+            stats.messages[message["type"]] += 1
+            if message["type"] != "new_question":
+                continue
+            content = message["data"]["content"]
+            if content.startswith(MARKER) and content in stats.posted:
+                stats.broadcast_latencies.append(received_at - stats.posted[content])
+    except Exception as e:
+        stats.errors[f"receive: {type(e).__name__}"] += 1
+
+
+async def ping(websocket: Any) -> None:
+    # Like the frontend, keeps the server from reaping the attendee
+    while True:
+        await asyncio.sleep(30)
+        await websocket.send("ping")
+
+
+async def request(
+    stats: Stats,
+    name: str,
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    **kwargs: Any,
+) -> httpx.Response | None:
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+        response.raise_for_status()
+    except Exception as e:
+        stats.errors[f"{name}: {type(e).__name__}"] += 1
+        return None
+    stats.request_latencies.setdefault(name, []).append(time.perf_counter() - start)
+    return response
+
+
+async def actor(
+    client: httpx.AsyncClient,
+    questions_url: str,
+    question_ratio: float,
+    rate: float,
+    stats: Stats,
+    stop: asyncio.Event,
+) -> None:
+    identifier = uuid4().hex
+    while not stop.is_set():
+        if not stats.question_ids or random.random() < question_ratio:
+            content = f"{MARKER} {uuid4().hex}"
+            stats.posted[content] = time.perf_counter()
+            response = await request(
+                stats,
+                "create_question",
+                client,
+                "POST",
+                questions_url,
+                params={"user_name": "Load test", "attendee_identifier": identifier},
+                json={"content": content},
+            )
+            if response is not None:
+                stats.question_ids.append(response.json()["id"])
+        else:
+            question_id = random.choice(stats.question_ids)
+            await request(
+                stats,
+                "like_question",
+                client,
+                "POST",
+                f"{questions_url}/{question_id}/like",
+            )
+        # Exponential gaps: a Poisson arrival of actions at `rate` per second
+        await asyncio.sleep(random.expovariate(rate))
+
+
+def database_counters() -> dict[str, int]:
+    url = make_url(str(settings.SQLALCHEMY_DATABASE_URI))
+    conninfo = url.set(drivername="postgresql").render_as_string(hide_password=False)
+    with psycopg.connect(conninfo, autocommit=True) as connection:
+        counters = {}
+        row = connection.execute(
+            "SELECT xact_commit + xact_rollback FROM pg_stat_database"
+            " WHERE datname = current_database()"
+        ).fetchone()
+        counters["transactions"] = row[0] if row else 0
+        try:
+            row = connection.execute(
+                "SELECT sum(calls)::bigint FROM pg_stat_statements"
+                " WHERE dbid = (SELECT oid FROM pg_database"
+                " WHERE datname = current_database())"
+            ).fetchone()
+            counters["statements"] = row[0] if row and row[0] else 0
+        except psycopg.Error:
+            pass
+        return counters
+
+
+async def create_event(client: httpx.AsyncClient, api_url: str) -> str:
+    response = await client.post(
+        f"{api_url}/login/access-token",
+        data={
+            "username": settings.FIRST_SUPERUSER,
+            "password": settings.FIRST_SUPERUSER_PASSWORD,
+        },
+    )
+    response.raise_for_status()
+    token = response.json()["access_token"]
+    response = await client.post(
+        f"{api_url}/events/",
+        headers={"Authorization": f"Bearer {token}"},
+        json={"name": f"Load test {time.strftime('%Y-%m-%d %H:%M:%S')}"},
+    )
+    response.raise_for_status()
+    event_id: str = response.json()["id"]
+    return event_id
+
+
+def report(stats: Stats, duration: float, database: dict[str, int]) -> None:
+    print(f"\nAttendees connected: {stats.connected}")
+    print(f"Messages received: {dict(stats.messages)}")
+
+    latencies = stats.broadcast_latencies
+    print(f"\nBroadcast latency ({len(latencies)} deliveries)")
+    for p in (50, 90, 99, 99.9):
+        print(f"  p{p:<5} {percentile(latencies, p) * 1000:>9.1f} ms")
+    if latencies:
+        print(f"  max    {max(latencies) * 1000:>9.1f} ms")
+
+    print("\nRequests")
+    for name, values in sorted(stats.request_latencies.items()):
+        print(
+            f"  {name:<16} {len(values) / duration:>8.1f}/s"
+            f"  p50 {percentile(values, 50) * 1000:>7.1f} ms"
+            f"  p99 {percentile(values, 99) * 1000:>7.1f} ms"
+        )
+    requests = sum(len(values) for values in stats.request_latencies.values())
+
+    print("\nDatabase")
+    for name, count in database.items():
+        per_request = f" ({count / requests:.1f} per request)" if requests else ""
+        print(f"  {name:<16} {count:>8}{per_request}")
+
+    if stats.errors:
+        print(f"\nErrors: {dict(stats.errors)}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    api_url = f"{args.url.rstrip('/')}{settings.API_V1_STR}"
+    limits = httpx.Limits(max_connections=args.actors)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        event_id = args.event_id or await create_event(client, api_url)
+        ws_url = f"{api_url.replace('http', 'ws', 1)}/ws/events/{event_id}"
+        questions_url = f"{api_url}/questions/events/{event_id}/questions"
+        stats = Stats()
+        stop = asyncio.Event()
+
+        print(f"Connecting {args.attendees} attendees to event {event_id}")
+        connecting = asyncio.Semaphore(100)
+        attendees = [
+            asyncio.create_task(
+                attendee(ws_url, args.encoding, stats, connecting, stop)
+            )
+            for _ in range(args.attendees)
+        ]
+        while stats.connected + sum(stats.errors.values()) < args.attendees:
+            await asyncio.sleep(0.1)
+
+        print(f"Running {args.actors} actors for {args.duration}s")
+        before = database_counters()
+        start = time.perf_counter()
+        actors = [
+            asyncio.create_task(
+                actor(
+                    client, questions_url, args.question_ratio, args.rate, stats, stop
+                )
+            )
+            for _ in range(args.actors)
+        ]
+        await asyncio.sleep(args.duration)
+        stop.set()
+        await asyncio.gather(*actors)
+        duration = time.perf_counter() - start
+        # Let the last broadcasts arrive, and the statistics be flushed
+        await asyncio.sleep(1)
+        after = database_counters()
+        await asyncio.gather(*attendees)
+
+    database = {name: after[name] - before[name] for name in after}
+    report(stats, duration, database)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--event-id", help="Event to run on, a new one by default")
+    parser.add_argument("--attendees", type=int, default=500)
+    parser.add_argument(
+        "--actors", type=int, default=20, help="Attendees posting and liking"
+    )
+    parser.add_argument(
+        "--rate", type=float, default=2, help="Actions per second of each actor"
+    )
+    parser.add_argument(
+        "--question-ratio",
+        type=float,
+        default=0.2,
+        help="Share of the actions that post a question, the others are likes",
+    )
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--encoding", choices=["json", "msgpack"], default="json")
+    asyncio.run(main(parser.parse_args()))
@@ -68,6 +68,119 @@ class Settings(BaseSettings):
             path=self.POSTGRES_DB,
         )
 
+    # A streaming replica of the database, read by the routes that serve most
+    # of the traffic (listings, single questions and events). Same user,
+    # password and database as the primary
+    POSTGRES_REPLICA_SERVER: str | None = None
+    POSTGRES_REPLICA_PORT: int | None = None
+    # After a write, a client reads from the primary for this long, so that
+    # replication lag doesn't hide its own writes from it
+    DB_READ_YOUR_WRITES_SECONDS: int = 5
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def SQLALCHEMY_REPLICA_DATABASE_URI(self) -> PostgresDsn | None:
+        if not self.POSTGRES_REPLICA_SERVER:
+            return None
+        return MultiHostUrl.build(
+            scheme="postgresql+psycopg",
+            username=self.POSTGRES_USER,
+            password=self.POSTGRES_PASSWORD,
+            host=self.POSTGRES_REPLICA_SERVER,
+            port=self.POSTGRES_REPLICA_PORT or self.POSTGRES_PORT,
+            path=self.POSTGRES_DB,
+        )
+
+    # Connections of each engine of each worker: DB_POOL_SIZE kept open, up to
+    # DB_MAX_OVERFLOW more in bursts, then requests wait up to
+    # DB_POOL_TIMEOUT_SECONDS for one. Waits are logged as saturation
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30
+    # Connections older than this are replaced on checkout, -1 keeps them
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    # Test connections on checkout, at the cost of a round trip each
+    DB_POOL_PRE_PING: bool = False
+    # Statements running longer are cancelled by Postgres, 0 for no limit
+    DB_STATEMENT_TIMEOUT_MS: int = 0
+    # Behind PgBouncer in transaction mode: no prepared statements, they don't
+    # outlive the transaction's server connection. LISTEN/NOTIFY needs a
+    # direct connection, don't combine with the "postgres" broadcast backend
+    DB_PGBOUNCER: bool = False
+
+    @model_validator(mode="after")
+    def _check_pgbouncer_statement_timeout(self) -> Self:
+        if self.DB_PGBOUNCER and self.DB_STATEMENT_TIMEOUT_MS:
+            raise ValueError(
+                "PgBouncer doesn't pass DB_STATEMENT_TIMEOUT_MS on, set "
+                "statement_timeout on the database role instead"
+            )
+        return self
+
+    # Statements taking longer are logged with their duration, 0 to log none
+    DB_SLOW_QUERY_MS: float = 200
+    # Bearer token Prometheus scrapes /metrics with, without one the metrics
+    # are public
+    METRICS_TOKEN: str | None = None
+
+    # "memory" only reaches sockets of the current worker, run with
+    # "postgres" (LISTEN/NOTIFY) as soon as there is more than one worker
+    BROADCAST_BACKEND: Literal["memory", "postgres"] = "memory"
+    # Clients that can't take a message within the timeout are disconnected,
+    # those with a full queue get a resync message instead of the backlog
+    WS_SEND_TIMEOUT_SECONDS: float = 5
+    WS_SEND_QUEUE_SIZE: int = 64
+    # Deltas kept per event for clients resuming after a reconnect, and for
+    # how long after its last client left
+    WS_REPLAY_BUFFER_SIZE: int = 256
+    WS_REPLAY_RETENTION_SECONDS: float = 300
+    # Every interval, clients get a heartbeat message and the ones not heard
+    # from within the idle timeout are dropped (the frontend pings every 30s).
+    # An interval of 0 disables both
+    WS_HEARTBEAT_INTERVAL_SECONDS: float = 15
+    WS_IDLE_TIMEOUT_SECONDS: float = 75
+    # Clients of one event a worker takes, the next ones are closed with 1013.
+    # 0 for no cap
+    WS_MAX_CONNECTIONS_PER_EVENT: int = 0
+    # Sends in flight per event, a huge event fans out in turns with the
+    # others instead of holding up the whole event loop
+    WS_EVENT_SEND_CONCURRENCY: int = 64
+    # Events served by dedicated workers: event id -> websocket base URL of
+    # their worker, e.g. {"<event id>": "wss://keynote.example.com"}. Needs
+    # the "postgres" broadcast backend. Clients of these events connecting
+    # elsewhere are redirected, WS_SHARD_URL is the base URL of this worker
+    WS_EVENT_SHARDS: dict[str, str] = {}
+    WS_SHARD_URL: str | None = None
+    # Write likes behind in one bulk UPDATE per interval, 0 writes every like
+    # right away
+    LIKE_FLUSH_INTERVAL_MS: int = 0
+    # Boards of the top questions are reloaded from the database after this,
+    # it bounds how long changes made on other workers take to show up
+    LEADERBOARD_TTL_SECONDS: float = 30
+    # Serialized first pages of the question listings, cached until a change
+    # to their event. Changes made on other workers that aren't broadcast
+    # (edits, deletions) show up after the TTL. 0 disables the cache
+    LISTING_CACHE_TTL_SECONDS: float = 2
+    LISTING_CACHE_SIZE: int = 1024
+    # Events looked up by id or join code. Edits made on other workers,
+    # including to when the event starts and ends, show up after the TTL: the
+    # schedule is enforced from it, so keep it short. 0 disables the cache
+    EVENT_CACHE_TTL_SECONDS: float = 3
+    EVENT_CACHE_SIZE: int = 4096
+    # Users of the access tokens. Changes made on other workers, including
+    # deactivating or deleting a user, show up after the TTL. 0 disables it
+    USER_CACHE_TTL_SECONDS: float = 10
+    USER_CACHE_SIZE: int = 1024
+    # bcrypt work factor of new hashes, each step doubles the cost (12 is
+    # ~250ms). Existing hashes keep the one they were made with
+    PASSWORD_HASH_ROUNDS: int = 12
+    # Passwords are hashed and checked on threads of their own, at most
+    # PASSWORD_HASH_WORKERS at a time with PASSWORD_HASH_QUEUE_SIZE more
+    # waiting, the rest get a 503. Together they must stay well below the 40
+    # threads that serve the sync routes, as every waiting login holds one
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_SIZE: int = 16
+
     SMTP_TLS: bool = True
     SMTP_SSL: bool = False
     SMTP_PORT: int = 587
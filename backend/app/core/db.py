@@ -1,10 +1,176 @@
+import logging
+import time
+from collections.abc import Generator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, cast
+
+from sqlalchemy import Connection, event
+from sqlalchemy.engine import ExceptionContext
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry, QueuePool
 from sqlmodel import Session, create_engine, select
 
 from app import crud
 from app.core.config import settings
+from app.core.metrics import DB_POOL_CHECKED_OUT, DB_POOL_CHECKOUT_DURATION
 from app.models import User, UserCreate
 
-engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+logger = logging.getLogger(__name__)
+
+
+# Saturation is logged at most this often per pool, bursts would flood the logs
+SATURATION_LOG_INTERVAL_SECONDS = 10
+
+
+class TimedQueuePool(QueuePool):
+    """
+    Records how long checkouts wait for a connection in the metrics, and logs
+    the ones that found the pool exhausted.
+    """
+
+    engine_name = "sync"
+    _saturated_checkouts = 0
+    _saturation_logged_at = 0.0
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        saturated = (
+            self.checkedin() == 0
+            and self.checkedout() >= self.size() + self._max_overflow
+        )
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            DB_POOL_CHECKOUT_DURATION.labels(self.engine_name).observe(waited)
+            if saturated:
+                self._log_saturation(waited)
+
+    def _log_saturation(self, waited: float) -> None:
+        self._saturated_checkouts += 1
+        now = time.monotonic()
+        if now - self._saturation_logged_at < SATURATION_LOG_INTERVAL_SECONDS:
+            return
+        logger.warning(
+            f"Database pool of the {self.engine_name} engine saturated: "
+            f"{self._saturated_checkouts} checkouts had to wait for a connection, "
+            f"the last one {waited * 1000:.0f} ms. {self.status()}"
+        )
+        self._saturated_checkouts = 0
+        self._saturation_logged_at = now
+
+
+class TimedAsyncQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    engine_name = "async"
+
+
+class TimedReplicaQueuePool(TimedAsyncQueuePool):
+    engine_name = "replica"
+
+
+def engine_options() -> dict[str, Any]:
+    """Pool and connection arguments of the engines, from the settings."""
+    connect_args: dict[str, Any] = {}
+    if settings.DB_PGBOUNCER:
+        connect_args["prepare_threshold"] = None
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        connect_args["options"] = (
+            f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"
+        )
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": connect_args,
+    }
+
+
+engine = create_engine(
+    str(settings.SQLALCHEMY_DATABASE_URI),
+    poolclass=TimedQueuePool,
+    **engine_options(),
+)
+# psycopg 3 speaks asyncio natively, the same URL selects its async driver
+async_engine = create_async_engine(
+    str(settings.SQLALCHEMY_DATABASE_URI),
+    poolclass=TimedAsyncQueuePool,
+    **engine_options(),
+)
+# Reads that can lag behind the writes a little, the primary without a replica
+replica_engine = (
+    create_async_engine(
+        str(settings.SQLALCHEMY_REPLICA_DATABASE_URI),
+        poolclass=TimedReplicaQueuePool,
+        **engine_options(),
+    )
+    if settings.SQLALCHEMY_REPLICA_DATABASE_URI
+    else async_engine
+)
+
+
+@dataclass
+class QueryStats:
+    statements: int = 0
+    # Seconds spent in the database
+    duration: float = 0
+
+
+_query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries() -> Generator[QueryStats, None, None]:
+    """
+    Counts the statements run in the block and their time, including the ones
+    of the tasks and threads started from it (they copy the context).
+    """
+    stats = QueryStats()
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+
+
+def _before_cursor_execute(conn: Connection, *_args: Any) -> None:
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(
+    conn: Connection, _cursor: Any, statement: str, *_args: Any
+) -> None:
+    duration = time.perf_counter() - conn.info["query_start"].pop()
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.duration += duration
+    if settings.DB_SLOW_QUERY_MS and duration * 1000 > settings.DB_SLOW_QUERY_MS:
+        logger.warning(f"Slow query ({duration * 1000:.0f} ms): {statement}")
+
+
+def _handle_error(context: ExceptionContext) -> None:
+    # A failed statement never gets to after_cursor_execute
+    if context.connection is not None and context.connection.info.get("query_start"):
+        context.connection.info["query_start"].pop()
+
+
+def _count_checked_out(pool: TimedQueuePool) -> None:
+    checked_out = DB_POOL_CHECKED_OUT.labels(pool.engine_name)
+    event.listen(pool, "checkout", lambda *_: checked_out.inc())
+    event.listen(pool, "checkin", lambda *_: checked_out.dec())
+
+
+# All engines, the sync one is behind the routes that still use Session
+for _engine in {engine, async_engine.sync_engine, replica_engine.sync_engine}:
+    event.listen(_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(_engine, "handle_error", _handle_error)
+    # All of them are created with a subclass of it
+    _count_checked_out(cast(TimedQueuePool, _engine.pool))
 
 
 # make sure all SQLModel models are imported (app.models) before initializing DB
@@ -0,0 +1,81 @@
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Requests by route, named like the operation ids of the OpenAPI schema
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time to handle an HTTP request",
+    ["method", "route", "status"],
+)
+HTTP_REQUEST_DB_STATEMENTS = Histogram(
+    "http_request_db_statements",
+    "Database statements run by an HTTP request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+HTTP_REQUEST_DB_DURATION = Histogram(
+    "http_request_db_duration_seconds",
+    "Time an HTTP request spent in the database",
+    ["route"],
+)
+
+DB_POOL_CHECKOUT_DURATION = Histogram(
+    "db_pool_checkout_duration_seconds",
+    "Time waited for a connection from the pool, connecting included",
+    ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30),
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "Connections checked out of the pool",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+
+# Not by event: a multiprocess gauge can't drop the series of a label, the
+# events of the past would pile up. /ws/stats has them by event.
+WS_CONNECTIONS = Gauge(
+    "ws_connections",
+    "Live websocket connections",
+    multiprocess_mode="livesum",
+)
+WS_BROADCAST_DURATION = Histogram(
+    "ws_broadcast_duration_seconds",
+    "Time to serialize and publish a broadcast",
+)
+WS_FANOUT_DURATION = Histogram(
+    "ws_fanout_duration_seconds",
+    "Time to queue a broadcast for the websockets of the worker",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1),
+)
+WS_DROPPED_CONNECTIONS = Counter(
+    "ws_dropped_connections",
+    "Websocket clients disconnected or turned away by the server",
+    ["reason"],
+)
+
+PASSWORD_HASH_REJECTED = Counter(
+    "password_hash_rejected",
+    "Password hashes and checks turned away, with too many already waiting",
+)
+
+
+def render() -> tuple[bytes, str]:
+    """The metrics in the Prometheus text format, and its content type."""
+    # With several workers, PROMETHEUS_MULTIPROC_DIR set to a directory they
+    # share makes the scrape report all of them, not just the one serving it
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)  # type: ignore[no-untyped-call]
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
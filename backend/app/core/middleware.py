@@ -0,0 +1,149 @@
+import time
+from http.cookies import SimpleCookie
+
+import sentry_sdk
+from fastapi.routing import APIRoute
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.db import track_queries
+from app.core.metrics import (
+    HTTP_REQUEST_DB_DURATION,
+    HTTP_REQUEST_DB_STATEMENTS,
+    HTTP_REQUEST_DURATION,
+)
+
+
+def route_name(scope: Scope) -> str:
+    """
+    The operation id of the route that handled the request, once routed.
+
+    Labels metrics by route and not by path, which would make a series per
+    event and question.
+    """
+    route = scope.get("route")
+    if isinstance(route, APIRoute):
+        return route.unique_id
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Records the duration of every HTTP request by route and status."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"], route_name(scope), str(status)
+            ).observe(time.perf_counter() - start)
+
+
+class QueryStatsMiddleware:
+    """
+    Counts the statements and the database time of every HTTP request.
+
+    They're recorded in the metrics by route. Outside production they're also
+    returned in the `X-DB-Statements` and `Server-Timing` headers, in
+    production recorded as measurements of the request's Sentry transaction.
+    Statements run after the response started (streaming bodies, background
+    tasks) only make the measurements.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+
+            async def send_with_stats(message: Message) -> None:
+                if (
+                    message["type"] == "http.response.start"
+                    and settings.ENVIRONMENT != "production"
+                ):
+                    headers = MutableHeaders(scope=message)
+                    headers.append("X-DB-Statements", str(stats.statements))
+                    headers.append(
+                        "Server-Timing", f"db;dur={stats.duration * 1000:.1f}"
+                    )
+                await send(message)
+
+            await self.app(scope, receive, send_with_stats)
+
+        route = route_name(scope)
+        HTTP_REQUEST_DB_STATEMENTS.labels(route).observe(stats.statements)
+        HTTP_REQUEST_DB_DURATION.labels(route).observe(stats.duration)
+        if settings.ENVIRONMENT == "production":
+            sentry_sdk.set_measurement("db_statements", stats.statements)
+            sentry_sdk.set_measurement(
+                "db_duration", stats.duration * 1000, "millisecond"
+            )
+
+
+# Set on the responses to writes, reads from clients that have it go to the
+# primary
+RECENT_WRITE_COOKIE = "recent_write"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class ReadYourWritesMiddleware:
+    """
+    Flags the clients that just wrote, so they read their writes.
+
+    Successful writes get a cookie lasting DB_READ_YOUR_WRITES_SECONDS, and
+    `get_async_read_db` sends the reads of the clients that have it to the
+    primary instead of the replica. Without a replica there's nothing to flag.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] in SAFE_METHODS
+            or not settings.POSTGRES_REPLICA_SERVER
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                MutableHeaders(scope=message).append("Set-Cookie", recent_write())
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+def recent_write() -> str:
+    cookie: SimpleCookie = SimpleCookie()
+    cookie[RECENT_WRITE_COOKIE] = "1"
+    morsel = cookie[RECENT_WRITE_COOKIE]
+    morsel["max-age"] = settings.DB_READ_YOUR_WRITES_SECONDS
+    morsel["path"] = "/"
+    morsel["httponly"] = True
+    morsel["samesite"] = "lax"
+    if settings.ENVIRONMENT != "local":
+        morsel["secure"] = True
+    return morsel.OutputString()
@@ -1,10 +1,24 @@
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+
 import sentry_sdk
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.routing import APIRoute
 from starlette.middleware.cors import CORSMiddleware
 
+from app.api.likes import like_aggregator
 from app.api.main import api_router
+from app.api.routes import metrics
+from app.api.websockets.connection import manager
 from app.core.config import settings
+from app.core.db import async_engine, replica_engine
+from app.core.middleware import (
+    MetricsMiddleware,
+    QueryStatsMiddleware,
+    ReadYourWritesMiddleware,
+)
+from app.core.security import PasswordHasherBusy
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
@@ -14,12 +28,30 @@ def custom_generate_unique_id(route: APIRoute) -> str:
 if settings.SENTRY_DSN and settings.ENVIRONMENT != "local":
     sentry_sdk.init(dsn=str(settings.SENTRY_DSN), enable_tracing=True)
 
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncGenerator[None, None]:
+    await manager.startup()
+    if settings.LIKE_FLUSH_INTERVAL_MS:
+        await like_aggregator.startup()
+    yield
+    await like_aggregator.shutdown()
+    await manager.shutdown()
+    await async_engine.dispose()
+    await replica_engine.dispose()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     generate_unique_id_function=custom_generate_unique_id,
+    lifespan=lifespan,
 )
 
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 # Set all CORS enabled origins
 if settings.all_cors_origins:
     app.add_middleware(
@@ -30,4 +62,19 @@ if settings.all_cors_origins:
         allow_headers=["*"],
     )
 
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy(
+    _request: Request, _exc: PasswordHasherBusy
+) -> JSONResponse:
+    # A login rush, turned away before it takes every thread of the sync routes
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many logins at once, try again shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
+# At the root, where Prometheus looks by default
+app.include_router(metrics.router)
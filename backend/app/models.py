@@ -2,6 +2,7 @@ import uuid
 from datetime import datetime, timezone
 
 from pydantic import EmailStr
+from sqlalchemy import Index, text
 from sqlmodel import Field, Relationship, SQLModel
 
 
@@ -157,7 +158,7 @@ class Event(EventBase, TimestampModel, table=True):
     owner: User = Relationship(back_populates="events")
     posts: list["Post"] = Relationship(back_populates="event")
     name: str = Field(max_length=255)
-    code: str = Field(max_length=255)
+    code: str = Field(unique=True, index=True, max_length=255)
     audience_peak: int = 0
     started_at: datetime | None = None
     expired_at: datetime | None = None
@@ -198,7 +199,7 @@ class Post(PostBase, TimestampModel, table=True):
 
 class QuestionBase(SQLModel):
     title: str | None = Field(default=None, max_length=255)
-    content: str
+    content: str = Field(max_length=1000)
     position: int = 0
     pinned: bool = False
     like_count: int = Field(default=0)
@@ -211,7 +212,7 @@ class QuestionCreate(QuestionBase):
 
 class QuestionUpdate(QuestionBase):
     title: str | None = Field(default=None, max_length=255)
-    content: str | None = None
+    content: str | None = Field(default=None, max_length=1000)  # type: ignore
     position: int | None = None
     pinned: bool | None = None
 
@@ -230,10 +231,46 @@ class QuestionPublic(QuestionBase):
 
 class QuestionsPublic(SQLModel):
     data: list[QuestionPublic]
-    count: int
+    # None when the count was skipped
+    count: int | None = None
+    next_cursor: str | None = None
 
 
 class Question(QuestionBase, TimestampModel, table=True):
+    # Match the listing orders of build_questions_query, with id as tie-breaker
+    __table_args__ = (
+        Index("ix_question_parent_id", "parent_id"),
+        Index(
+            "ix_question_event_parent_like_count",
+            "event_id",
+            "parent_id",
+            "like_count",
+            "id",
+        ),
+        Index(
+            "ix_question_event_parent_inserted_at",
+            "event_id",
+            "parent_id",
+            "inserted_at",
+            "id",
+        ),
+        # Top-level questions are the main listing, keep them in smaller indexes
+        Index(
+            "ix_question_event_top_level_like_count",
+            "event_id",
+            "like_count",
+            "id",
+            postgresql_where=text("parent_id IS NULL"),
+        ),
+        Index(
+            "ix_question_event_top_level_inserted_at",
+            "event_id",
+            "inserted_at",
+            "id",
+            postgresql_where=text("parent_id IS NULL"),
+        ),
+    )
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     user_name: str | None = Field(default=None, max_length=255)
     attendee_identifier: str | None = Field(default=None, max_length=255)
@@ -241,8 +278,23 @@ class Question(QuestionBase, TimestampModel, table=True):
     event: Event = Relationship(back_populates="questions")
     parent_id: uuid.UUID | None = Field(default=None, foreign_key="question.id")
     title: str | None = Field(default=None, max_length=255)
+    # Bounded by the API schemas only, questions asked before are kept whole
     content: str
     position: int = 0
     pinned: bool = False
     like_count: int = 0
     followup_count: int = 0
+
+
+class EventConnections(SQLModel):
+    event_id: str
+    connections: int
+    # Fell behind, a resync is waiting for them
+    lagging: int
+    # Messages waiting in the send queues
+    queued: int
+
+
+class EventsConnections(SQLModel):
+    data: list[EventConnections]
+    count: int
@@ -0,0 +1,75 @@
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.tests.utils.event import create_random_event
+from app.tests.utils.utils import count_statements
+from app.utils import EVENT_CODE_ALPHABET, EVENT_CODE_LENGTH, generate_event_code
+
+
+def test_generate_event_code() -> None:
+    code = generate_event_code()
+    assert len(code) == EVENT_CODE_LENGTH
+    assert set(code) <= set(EVENT_CODE_ALPHABET)
+
+
+def test_create_event_draws_a_new_code_on_collision(
+    client: TestClient, normal_user_token_headers: dict[str, str], db: Session
+) -> None:
+    taken, fresh = create_random_event(db).code, generate_event_code()
+    with patch("app.api.routes.events.generate_event_code", side_effect=[taken, fresh]):
+        response = client.post(
+            f"{settings.API_V1_STR}/events/",
+            headers=normal_user_token_headers,
+            json={"name": "Keynote"},
+        )
+    assert response.status_code == 200
+    assert response.json()["code"] == fresh
+
+
+def test_get_event_by_code(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    response = client.post(
+        f"{settings.API_V1_STR}/events/",
+        headers=normal_user_token_headers,
+        json={"name": "Keynote"},
+    )
+    event = response.json()
+    url = f"{settings.API_V1_STR}/events/by-code/{event['code']}"
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.json() == event
+
+    # Served from the cache until the event is edited
+    with count_statements() as statements:
+        response = client.get(url)
+    assert response.json() == event
+    assert not statements
+
+    response = client.put(
+        f"{settings.API_V1_STR}/events/{event['id']}/edit",
+        headers=normal_user_token_headers,
+        json={"name": "Closing keynote"},
+    )
+    assert response.status_code == 200
+    response = client.get(url)
+    assert response.json()["name"] == "Closing keynote"
+
+
+def test_get_event_by_code_ignores_case_and_spaces(
+    client: TestClient, db: Session
+) -> None:
+    event = create_random_event(db)
+    code = f" {event.code.lower()} "
+    response = client.get(f"{settings.API_V1_STR}/events/by-code/{code}")
+    assert response.status_code == 200
+    assert response.json()["id"] == str(event.id)
+
+
+def test_get_event_by_code_not_found(client: TestClient) -> None:
+    response = client.get(f"{settings.API_V1_STR}/events/by-code/NOSUCH")
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Event not found"
@@ -0,0 +1,81 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.tests.utils.event import create_random_event
+
+
+def test_metrics(client: TestClient, db: Session) -> None:
+    event = create_random_event(db)
+    client.get(f"{settings.API_V1_STR}/questions/events/{event.id}/questions")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert (
+        'http_request_duration_seconds_count{method="GET",'
+        'route="questions-list_questions",status="200"}'
+    ) in response.text
+    assert 'http_request_db_statements_count{route="questions-list_questions"}' in (
+        response.text
+    )
+    assert 'db_pool_checkout_duration_seconds_count{engine="async"}' in response.text
+
+
+def test_metrics_token(client: TestClient) -> None:
+    with patch.object(settings, "METRICS_TOKEN", "secret"):
+        response = client.get("/metrics")
+        assert response.status_code == 401
+        response = client.get("/metrics", headers={"Authorization": "Bearer secret"})
+        assert response.status_code == 200
+
+
+# Run apart: prometheus_client picks the multiprocess storage when imported
+MULTIPROCESS_SCRIPT = """
+import asyncio
+
+from app.api.websockets.connection import ConnectionManager
+from app.core.metrics import render
+
+
+class WebSocket:
+    async def send(self, message):
+        pass
+
+    async def close(self, code=1000):
+        pass
+
+
+async def main():
+    manager = ConnectionManager()
+    websockets = [WebSocket() for _ in range(3)]
+    for i, websocket in enumerate(websockets):
+        await manager.connect(websocket, f"event-{i}")
+    print(render()[0].decode())
+    for i, websocket in enumerate(websockets[1:], 1):
+        manager.disconnect(websocket, f"event-{i}")
+    print(render()[0].decode())
+
+
+asyncio.run(main())
+"""
+
+
+def test_metrics_multiprocess(tmp_path: Path) -> None:
+    result = subprocess.run(
+        [sys.executable, "-c", MULTIPROCESS_SCRIPT],
+        env={**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    connected, disconnected = result.stdout.split("# HELP ws_connections")[1:]
+    # One series for all the events, the finished ones leave none behind
+    assert "event_id" not in result.stdout
+    assert "\nws_connections 3.0\n" in connected
+    assert "\nws_connections 1.0\n" in disconnected
@@ -0,0 +1,426 @@
+import base64
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.api.likes import like_aggregator
+from app.api.listings import listing_cache
+from app.api.routes.questions import build_questions_query
+from app.core.config import settings
+from app.tests.utils.event import create_random_event
+from app.tests.utils.question import create_random_question
+from app.tests.utils.utils import count_statements
+
+
+def test_list_questions(client: TestClient, db: Session) -> None:
+    event = create_random_event(db)
+    question = create_random_question(db, event.id)
+    create_random_question(db, event.id, parent_id=question.id)
+    response = client.get(
+        f"{settings.API_V1_STR}/questions/events/{event.id}/questions",
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert content["count"] == 1
+    assert content["data"][0]["id"] == str(question.id)
+    assert content["data"][0]["followup_count"] == 1
+
+
+def test_list_questions_statement_count_is_constant(
+    client: TestClient, db: Session
+) -> None:
+    event = create_random_event(db)
+    url = f"{settings.API_V1_STR}/questions/events/{event.id}/questions"
+    for _ in range(2):
+        create_random_question(db, event.id)
+    # Both counted with the event cached, and without the listing cached
+    client.get(url)
+    listing_cache.bump(event.id)
+    with count_statements() as few:
+        response = client.get(url)
+    assert response.status_code == 200
+    assert len(response.json()["data"]) == 2
+
+    for _ in range(20):
+        create_random_question(db, event.id)
+    listing_cache.bump(event.id)
+    with count_statements() as many:
+        response = client.get(url)
+    assert response.status_code == 200
+    assert len(response.json()["data"]) == 22
+    assert len(many) == len(few)
+
+
+def test_list_questions_not_modified(client: TestClient, db: Session) -> None:
+    event = create_random_event(db)
+    url = f"{settings.API_V1_STR}/questions/events/{event.id}/questions"
+    create_random_question(db, event.id)
+    response = client.get(url)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "no-cache"
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert not response.content
+
+    # A new question changes the listing, and so its ETag
+    response = client.post(
+        url,
+        params={"user_name": "Foo", "attendee_identifier": "foo"},
+        json={"content": "Anything new?"},
+    )
+    assert response.status_code == 200
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["count"] == 2
+
+
+def test_create_question_content_too_long(client: TestClient, db: Session) -> None:
+    event = create_random_event(db)
+    response = client.post(
+        f"{settings.API_V1_STR}/questions/events/{event.id}/questions",
+        params={"user_name": "Foo", "attendee_identifier": "foo"},
+        json={"content": "a" * 1001},
+    )
+    assert response.status_code == 422
+
+
+def test_update_question_content_too_long(client: TestClient, db: Session) -> None:
+    event = create_random_event(db)
+    question = create_random_question(db, event.id)
+    # Questions asked before the bound are stored whole
+    question.content = "a" * 2000
+    db.add(question)
+    db.commit()
+    response = client.put(
+        f"{settings.API_V1_STR}/questions/events/{event.id}/questions/{question.id}",
+        params={"attendee_identifier": question.attendee_identifier},
+        json={"content": "a" * 1001},
+    )
+    assert response.status_code == 422
+    db.refresh(question)
+    assert len(question.content) == 2000
+
+
+def test_list_questions_event_not_found(client: TestClient) -> None:
+    response = client.get(
+        f"{settings.API_V1_STR}/questions/events/{uuid.uuid4()}/questions",
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Event not found"
+
+
+def test_create_followup_updates_parent_count(client: TestClient, db: Session) -> None:
+    event = create_random_event(db)
+    parent = create_random_question(db, event.id)
+    response = client.post(
+        f"{settings.API_V1_STR}/questions/events/{event.id}/questions",
+        params={
+            "user_name": "Foo",
+            "attendee_identifier": "foo",
+            "parent_id": str(parent.id),
+        },
+        json={"content": "Follow-up"},
+    )
+    assert response.status_code == 200
+    assert response.json()["parent_id"] == str(parent.id)
+    db.refresh(parent)
+    assert parent.followup_count == 1
+
+
+def test_delete_followup_updates_parent_count(client: TestClient, db: Session) -> None:
+    event = create_random_event(db)
+    parent = create_random_question(db, event.id)
+    response = client.post(
+        f"{settings.API_V1_STR}/questions/events/{event.id}/questions",
+        params={
+            "user_name": "Foo",
+            "attendee_identifier": "foo",
+            "parent_id": str(parent.id),
+        },
+        json={"content": "Follow-up"},
+    )
+    followup_id = response.json()["id"]
+    response = client.delete(
+        f"{settings.API_V1_STR}/questions/events/{event.id}/questions/{followup_id}",
+        params={"attendee_identifier": "foo"},
+    )
+    assert response.status_code == 200
+    db.refresh(parent)
+    assert parent.followup_count == 0
+
+
+def test_like_question(client: TestClient, db: Session) -> None:
+    event = create_random_event(db)
+    question = create_random_question(db, event.id)
+    response = client.post(
+        f"{settings.API_V1_STR}/questions/events/{event.id}/questions/{question.id}/like",
+    )
+    assert response.status_code == 200
+    assert response.json()["like_count"] == 1
+
+
+def test_like_question_concurrently(client: TestClient, db: Session) -> None:
+    event = create_random_event(db)
+    question = create_random_question(db, event.id)
+    url = f"{settings.API_V1_STR}/questions/events/{event.id}/questions/{question.id}/like"
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        responses = list(executor.map(lambda _: client.post(url), range(40)))
+    assert all(response.status_code == 200 for response in responses)
+    db.refresh(question)
+    assert question.like_count == 40
+
+
+def test_like_question_wrong_event(client: TestClient, db: Session) -> None:
+    event = create_random_event(db)
+    question = create_random_question(db, event.id)
+    response = client.post(
+        f"{settings.API_V1_STR}/questions/events/{uuid.uuid4()}/questions/{question.id}/like",
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Event not found"
+
+    other_event = create_random_event(db)
+    response = client.post(
+        f"{settings.API_V1_STR}/questions/events/{other_event.id}/questions/{question.id}/like",
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Question not found"
+
+
+def test_like_question_write_behind(client: TestClient, db: Session) -> None:
+    event = create_random_event(db)
+    question = create_random_question(db, event.id)
+    url = f"{settings.API_V1_STR}/questions/events/{event.id}/questions/{question.id}/like"
+    top = f"{settings.API_V1_STR}/questions/events/{event.id}/questions/top"
+    assert client.get(top).json()["data"][0]["like_count"] == 0
+    with patch("app.core.config.settings.LIKE_FLUSH_INTERVAL_MS", 250):
+        for likes in range(1, 4):
+            response = client.post(url)
+            assert response.status_code == 200
+            assert response.json()["like_count"] == likes
+    db.refresh(question)
+    assert question.like_count == 0
+    # Already on the leaderboard of this worker
+    assert client.get(top).json()["data"][0]["like_count"] == 3
+
+    assert client.portal
+    client.portal.call(like_aggregator.flush)
+    db.refresh(question)
+    assert question.like_count == 3
+
+
+@pytest.mark.parametrize(
+    "sort_by,order,followups,index",
+    [
+        ("likes", "desc", False, "ix_question_event_top_level_like_count"),
+        ("created_at", "desc", False, "ix_question_event_top_level_inserted_at"),
+        ("likes", "asc", True, "ix_question_event_parent_like_count"),
+        ("created_at", "asc", True, "ix_question_event_parent_inserted_at"),
+    ],
+)
+def test_build_questions_query_uses_index(
+    db: Session, sort_by: str, order: str, followups: bool, index: str
+) -> None:
+    event = create_random_event(db)
+    parent = create_random_question(db, event.id)
+    query = build_questions_query(
+        event.id, parent.id if followups else None, sort_by, order
+    )
+    compiled = query.compile(dialect=db.get_bind().dialect)
+    connection = db.connection()
+    try:
+        # The table is tiny in tests and its stats depend on what ran before,
+        # rule out the other plans so only the index can serve the order
+        for setting in ("enable_seqscan", "enable_bitmapscan", "enable_sort"):
+            connection.exec_driver_sql(f"SET LOCAL {setting} = off")
+        plan = connection.exec_driver_sql(f"EXPLAIN {compiled}", compiled.params).all()
+    finally:
+        db.rollback()
+    plan_text = "\n".join(row[0] for row in plan)
+    assert index in plan_text
+    assert "Sort" not in plan_text
+
+
+@pytest.mark.parametrize("sort_by", ["likes", "created_at"])
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_list_questions_pages(
+    client: TestClient, db: Session, sort_by: str, order: str
+) -> None:
+    event = create_random_event(db)
+    for i in range(7):
+        question = create_random_question(db, event.id)
+        question.like_count = i % 3
+        db.add(question)
+    db.commit()
+    url = f"{settings.API_V1_STR}/questions/events/{event.id}/questions"
+    params: dict[str, Any] = {"sort_by": sort_by, "order": order}
+    full = client.get(url, params=params).json()
+
+    ids = []
+    cursor = None
+    while True:
+        page_params = {**params, "limit": 3, "with_count": False}
+        if cursor:
+            page_params["cursor"] = cursor
+        page = client.get(url, params=page_params).json()
+        assert page["count"] is None
+        assert len(page["data"]) <= 3
+        ids += [question["id"] for question in page["data"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert ids == [question["id"] for question in full["data"]]
+    assert full["count"] == 7
+    assert full["next_cursor"] is None
+
+
+def test_list_questions_invalid_cursor(client: TestClient, db: Session) -> None:
+    event = create_random_event(db)
+    url = f"{settings.API_V1_STR}/questions/events/{event.id}/questions"
+    response = client.get(url, params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+@pytest.mark.parametrize("field,value", [(2, 123), (2, None), (3, 123), (3, None)])
+def test_list_questions_cursor_with_wrong_types(
+    client: TestClient, db: Session, field: int, value: Any
+) -> None:
+    event = create_random_event(db)
+    for _ in range(2):
+        create_random_question(db, event.id)
+    url = f"{settings.API_V1_STR}/questions/events/{event.id}/questions"
+    page = client.get(url, params={"limit": 1}).json()
+    cursor = json.loads(base64.urlsafe_b64decode(page["next_cursor"]))
+    cursor[field] = value
+    cursor = base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+    response = client.get(url, params={"cursor": cursor})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_list_questions_cursor_of_other_order(client: TestClient, db: Session) -> None:
+    event = create_random_event(db)
+    for _ in range(2):
+        create_random_question(db, event.id)
+    url = f"{settings.API_V1_STR}/questions/events/{event.id}/questions"
+    page = client.get(url, params={"sort_by": "likes", "limit": 1}).json()
+    response = client.get(url, params={"cursor": page["next_cursor"]})
+    assert response.status_code == 400
+
+
+def test_top_questions(client: TestClient, db: Session) -> None:
+    event = create_random_event(db)
+    questions = [create_random_question(db, event.id) for _ in range(3)]
+    create_random_question(db, event.id, parent_id=questions[1].id)
+    base = f"{settings.API_V1_STR}/questions/events/{event.id}/questions"
+    response = client.get(f"{base}/top")
+    assert response.status_code == 200
+    assert response.json()["count"] == 3
+
+    for _ in range(2):
+        client.post(f"{base}/{questions[1].id}/like")
+    client.post(f"{base}/{questions[2].id}/like")
+    response = client.post(
+        base,
+        params={"user_name": "Foo", "attendee_identifier": "foo"},
+        json={"content": "New"},
+    )
+    new_id = response.json()["id"]
+    client.delete(
+        f"{base}/{questions[0].id}",
+        params={"attendee_identifier": questions[0].attendee_identifier},
+    )
+
+    # Served from memory, yet in step with the changes made since it loaded
+    with count_statements() as statements:
+        response = client.get(f"{base}/top", params={"limit": 2})
+    assert response.status_code == 200
+    assert statements == []
+    content = response.json()
+    assert content["count"] == 3
+    assert [question["id"] for question in content["data"]] == [
+        str(questions[1].id),
+        str(questions[2].id),
+    ]
+    assert content["data"][0]["like_count"] == 2
+
+    listing = client.get(base, params={"sort_by": "likes"}).json()
+    assert [question["id"] for question in listing["data"]] == [
+        str(questions[1].id),
+        str(questions[2].id),
+        new_id,
+    ]
+
+
+def test_top_questions_event_not_found(client: TestClient) -> None:
+    response = client.get(
+        f"{settings.API_V1_STR}/questions/events/{uuid.uuid4()}/questions/top",
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Event not found"
+
+
+def test_questions_only_while_the_event_runs(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    now = datetime.now(timezone.utc)
+    response = client.post(
+        f"{settings.API_V1_STR}/events/",
+        headers=normal_user_token_headers,
+        json={"name": "Keynote", "started_at": (now + timedelta(hours=1)).isoformat()},
+    )
+    event_id = response.json()["id"]
+    url = f"{settings.API_V1_STR}/questions/events/{event_id}/questions"
+    params = {"user_name": "Foo", "attendee_identifier": "foo"}
+    response = client.post(url, params=params, json={"content": "Too early?"})
+    assert response.status_code == 403
+    assert response.json()["detail"] == "Event has not started"
+
+    # Edits take effect right away, the cached event is dropped
+    response = client.put(
+        f"{settings.API_V1_STR}/events/{event_id}/edit",
+        headers=normal_user_token_headers,
+        json={"name": "Keynote", "started_at": (now - timedelta(hours=1)).isoformat()},
+    )
+    assert response.status_code == 200
+    response = client.post(url, params=params, json={"content": "Now?"})
+    assert response.status_code == 200
+    question_id = response.json()["id"]
+
+    # The event is cached, it costs no query
+    with count_statements() as statements:
+        client.get(url, params={"with_count": False, "limit": 1})
+    assert not any("FROM event" in statement for statement in statements)
+
+    response = client.put(
+        f"{settings.API_V1_STR}/events/{event_id}/edit",
+        headers=normal_user_token_headers,
+        json={"name": "Keynote", "expired_at": now.isoformat()},
+    )
+    assert response.status_code == 200
+    response = client.post(f"{url}/{question_id}/like")
+    assert response.status_code == 403
+    assert response.json()["detail"] == "Event has ended"
+    response = client.post(url, params=params, json={"content": "Too late?"})
+    assert response.status_code == 403
+    response = client.delete(
+        f"{url}/{question_id}", params={"attendee_identifier": "foo"}
+    )
+    assert response.status_code == 403
+    assert response.json()["detail"] == "Event has ended"
+
+    # The questions can still be read
+    response = client.get(url)
+    assert response.json()["count"] == 1
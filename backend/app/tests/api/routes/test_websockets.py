@@ -0,0 +1,166 @@
+import uuid
+from unittest.mock import patch
+
+import msgpack
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+from starlette.websockets import WebSocketDisconnect
+
+from app.api.websockets.connection import manager
+from app.core.config import settings
+from app.tests.utils.event import create_random_event
+from app.tests.utils.question import create_random_question
+
+
+def test_websocket_ping(client: TestClient, db: Session) -> None:
+    event = create_random_event(db)
+    with client.websocket_connect(
+        f"{settings.API_V1_STR}/ws/events/{event.id}"
+    ) as websocket:
+        assert websocket.receive_json()["type"] == "snapshot"
+        websocket.send_text("ping")
+        assert websocket.receive_text() == "pong"
+
+
+def test_websocket_event_not_found(client: TestClient) -> None:
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect(
+            f"{settings.API_V1_STR}/ws/events/{uuid.uuid4()}"
+        ) as websocket:
+            websocket.receive_text()
+
+
+def test_websocket_snapshot_and_resume(client: TestClient, db: Session) -> None:
+    event = create_random_event(db)
+    question = create_random_question(db, event.id)
+    url = f"{settings.API_V1_STR}/ws/events/{event.id}"
+    like_url = f"{settings.API_V1_STR}/questions/events/{event.id}/questions/{question.id}/like"
+
+    with client.websocket_connect(url) as websocket:
+        snapshot = websocket.receive_json()
+        assert snapshot["type"] == "snapshot"
+        assert [q["id"] for q in snapshot["data"]["questions"]] == [str(question.id)]
+        client.post(like_url)
+        delta = websocket.receive_json()
+        assert delta["type"] == "question_liked"
+        assert delta["seq"] == snapshot["seq"] + 1
+
+    client.post(like_url)
+    with client.websocket_connect(
+        url, params={"since": delta["seq"], "epoch": snapshot["epoch"]}
+    ) as websocket:
+        missed = websocket.receive_json()
+        assert missed["type"] == "question_liked"
+        assert missed["seq"] == delta["seq"] + 1
+        assert missed["data"]["like_count"] == 2
+
+
+def test_websocket_edit_and_delete_deltas(client: TestClient, db: Session) -> None:
+    event = create_random_event(db)
+    parent = create_random_question(db, event.id)
+    followup = create_random_question(db, event.id, parent_id=parent.id)
+    url = f"{settings.API_V1_STR}/ws/events/{event.id}"
+    question_url = (
+        f"{settings.API_V1_STR}/questions/events/{event.id}/questions/{followup.id}"
+    )
+    params = {"attendee_identifier": followup.attendee_identifier}
+
+    with client.websocket_connect(url) as websocket:
+        snapshot = websocket.receive_json()
+        client.put(question_url, params=params, json={"content": "Edited"})
+        edited = websocket.receive_json()
+        assert edited["type"] == "question_updated"
+        assert edited["seq"] == snapshot["seq"] + 1
+        assert edited["data"]["id"] == str(followup.id)
+        assert edited["data"]["content"] == "Edited"
+
+        client.delete(question_url, params=params)
+        deleted = websocket.receive_json()
+        assert deleted["type"] == "question_deleted"
+        assert deleted["seq"] == edited["seq"] + 1
+        assert deleted["data"] == {"id": str(followup.id), "parent_id": str(parent.id)}
+        parent_updated = websocket.receive_json()
+        assert parent_updated["type"] == "question_updated"
+        assert parent_updated["seq"] == deleted["seq"] + 1
+        assert parent_updated["data"] == {"id": str(parent.id), "followup_count": 0}
+
+
+def test_websocket_msgpack(client: TestClient, db: Session) -> None:
+    event = create_random_event(db)
+    question = create_random_question(db, event.id)
+    with client.websocket_connect(
+        f"{settings.API_V1_STR}/ws/events/{event.id}",
+        subprotocols=["unknown", "echoq.msgpack"],
+    ) as websocket:
+        assert websocket.accepted_subprotocol == "echoq.msgpack"
+        snapshot = msgpack.unpackb(websocket.receive_bytes())
+        assert snapshot["type"] == "snapshot"
+        sent = snapshot["data"]["questions"][0]
+        assert sent["id"] == str(question.id)
+        assert "attendee_identifier" not in sent
+
+
+def test_websocket_stats(
+    client: TestClient, db: Session, superuser_token_headers: dict[str, str]
+) -> None:
+    event = create_random_event(db)
+    with client.websocket_connect(
+        f"{settings.API_V1_STR}/ws/events/{event.id}"
+    ) as websocket:
+        # Registered by the time the snapshot is sent
+        websocket.receive_json()
+        response = client.get(
+            f"{settings.API_V1_STR}/ws/stats", headers=superuser_token_headers
+        )
+    assert response.status_code == 200
+    stats = {gauges["event_id"]: gauges for gauges in response.json()["data"]}
+    assert stats[str(event.id)]["connections"] == 1
+
+
+def test_websocket_stats_superuser_only(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    response = client.get(
+        f"{settings.API_V1_STR}/ws/stats", headers=normal_user_token_headers
+    )
+    assert response.status_code == 403
+
+
+def test_websocket_redirects_to_event_shard(client: TestClient, db: Session) -> None:
+    event = create_random_event(db)
+    shards = {str(event.id): "wss://keynote.example.com"}
+    with patch("app.core.config.settings.WS_EVENT_SHARDS", shards):
+        with client.websocket_connect(
+            f"{settings.API_V1_STR}/ws/events/{event.id}"
+        ) as websocket:
+            assert websocket.receive_json() == {
+                "type": "redirect",
+                "url": f"wss://keynote.example.com{settings.API_V1_STR}/ws/events/{event.id}",
+            }
+            with pytest.raises(WebSocketDisconnect) as exc_info:
+                websocket.receive_json()
+    assert exc_info.value.code == 1013
+
+    # The shard itself serves it
+    with patch.multiple(
+        "app.core.config.settings",
+        WS_EVENT_SHARDS=shards,
+        WS_SHARD_URL="wss://keynote.example.com",
+    ):
+        with client.websocket_connect(
+            f"{settings.API_V1_STR}/ws/events/{event.id}"
+        ) as websocket:
+            assert websocket.receive_json()["type"] == "snapshot"
+
+
+def test_websocket_event_full(client: TestClient, db: Session) -> None:
+    event = create_random_event(db)
+    url = f"{settings.API_V1_STR}/ws/events/{event.id}"
+    with patch.object(manager, "max_connections_per_event", 1):
+        with client.websocket_connect(url) as first:
+            first.receive_json()
+            with client.websocket_connect(url) as second:
+                with pytest.raises(WebSocketDisconnect) as exc_info:
+                    second.receive_json()
+    assert exc_info.value.code == 1013
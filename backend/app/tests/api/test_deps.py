@@ -0,0 +1,198 @@
+import uuid
+from collections.abc import Callable, Generator
+from datetime import datetime, timezone
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import Connection, event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import Session
+
+from app import crud
+from app.api import event_cache
+from app.core.config import settings
+from app.core.db import engine
+from app.core.middleware import RECENT_WRITE_COOKIE
+from app.models import UserCreate
+from app.tests.utils.event import create_random_event
+from app.tests.utils.user import user_authentication_headers
+from app.tests.utils.utils import count_statements, random_email, random_lower_string
+
+
+@pytest.fixture
+def replica(client: TestClient) -> Generator[AsyncEngine, None, None]:
+    # The primary database stands in for the replica, under an engine of its own
+    replica = create_async_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+    with (
+        patch.object(settings, "POSTGRES_REPLICA_SERVER", settings.POSTGRES_SERVER),
+        patch("app.api.deps.replica_engine", replica),
+    ):
+        yield replica
+    client.cookies.clear()
+    client.portal.call(replica.dispose)  # type: ignore[union-attr]
+
+
+def test_reads_go_to_the_replica(
+    client: TestClient, db: Session, replica: AsyncEngine
+) -> None:
+    statements: list[str] = []
+
+    def before_cursor_execute(*args: Any) -> None:
+        statements.append(args[2])
+
+    event.listen(replica.sync_engine, "before_cursor_execute", before_cursor_execute)
+    questions_url = f"{settings.API_V1_STR}/questions/events/{{}}/questions"
+    response = client.get(questions_url.format(create_random_event(db).id))
+    assert response.status_code == 200
+    assert statements
+    assert RECENT_WRITE_COOKIE not in response.cookies
+
+    # A client that just posted reads from the primary, where its question is
+    event_id = create_random_event(db).id
+    statements.clear()
+    response = client.post(
+        questions_url.format(event_id),
+        params={"user_name": "Foo", "attendee_identifier": "foo"},
+        json={"content": "Is it there yet?"},
+    )
+    assert response.status_code == 200
+    assert RECENT_WRITE_COOKIE in response.cookies
+    response = client.get(questions_url.format(event_id))
+    assert response.json()["count"] == 1
+    assert not statements
+
+
+@pytest.fixture
+def freeze_replica(replica: AsyncEngine) -> Generator[Callable[[], None], None, None]:
+    # Stops the replica at the state of the database when called, as if it
+    # lagged behind every write made after that
+    with engine.connect() as connection:
+
+        def freeze() -> None:
+            connection.execution_options(isolation_level="REPEATABLE READ")
+            snapshot = connection.exec_driver_sql(
+                "SELECT pg_export_snapshot()"
+            ).scalar()
+
+            def begin(replica_connection: Connection) -> None:
+                replica_connection.exec_driver_sql(
+                    "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ"
+                )
+                replica_connection.exec_driver_sql(
+                    f"SET TRANSACTION SNAPSHOT '{snapshot}'"
+                )
+
+            event.listen(replica.sync_engine, "begin", begin)
+
+        yield freeze
+        connection.rollback()
+
+
+def test_cached_listings_keep_reads_your_writes(
+    client: TestClient, db: Session, freeze_replica: Callable[[], None]
+) -> None:
+    questions_url = f"{settings.API_V1_STR}/questions/events/{{}}/questions"
+    questions_url = questions_url.format(create_random_event(db).id)
+    freeze_replica()
+    response = client.post(
+        questions_url,
+        params={"user_name": "Foo", "attendee_identifier": "foo"},
+        json={"content": "Is it there yet?"},
+    )
+    assert response.status_code == 200
+
+    # Another client polls meanwhile, and gets the listing of the replica
+    recent_write = client.cookies.pop(RECENT_WRITE_COOKIE)
+    assert client.get(questions_url).json()["count"] == 0
+    client.cookies.set(RECENT_WRITE_COOKIE, recent_write)
+    assert client.get(questions_url).json()["count"] == 1
+
+
+def test_cached_events_come_from_the_primary(
+    client: TestClient,
+    normal_user_token_headers: dict[str, str],
+    freeze_replica: Callable[[], None],
+) -> None:
+    response = client.post(
+        f"{settings.API_V1_STR}/events/",
+        headers=normal_user_token_headers,
+        json={"name": "Keynote"},
+    )
+    event_id = response.json()["id"]
+    freeze_replica()
+    response = client.put(
+        f"{settings.API_V1_STR}/events/{event_id}/edit",
+        headers=normal_user_token_headers,
+        json={"name": "Keynote", "expired_at": datetime.now(timezone.utc).isoformat()},
+    )
+    assert response.status_code == 200
+
+    # A read on the replica, which still has the event open, caches it anew
+    client.cookies.clear()
+    event_cache.events.clear()
+    questions_url = f"{settings.API_V1_STR}/questions/events/{event_id}/questions"
+    assert client.get(questions_url).status_code == 200
+    response = client.post(
+        questions_url,
+        params={"user_name": "Foo", "attendee_identifier": "foo"},
+        json={"content": "Still open?"},
+    )
+    assert response.status_code == 403
+
+
+@pytest.mark.usefixtures("replica")
+def test_failed_writes_are_not_flagged(client: TestClient) -> None:
+    response = client.post(
+        f"{settings.API_V1_STR}/questions/events/{uuid.uuid4()}/questions",
+        params={"user_name": "Foo", "attendee_identifier": "foo"},
+        json={"content": "Where does it go?"},
+    )
+    assert response.status_code == 404
+    assert RECENT_WRITE_COOKIE not in response.cookies
+
+
+def test_current_user_is_cached(client: TestClient, db: Session) -> None:
+    email, password = random_email(), random_lower_string()
+    crud.create_user(session=db, user_create=UserCreate(email=email, password=password))
+    headers = user_authentication_headers(client=client, email=email, password=password)
+    me_url = f"{settings.API_V1_STR}/users/me"
+    client.get(me_url, headers=headers)
+    with count_statements(engine) as statements:
+        response = client.get(me_url, headers=headers)
+    assert response.json()["email"] == email
+    assert not statements
+
+    # Changes go through the cache, and the cached user can be written
+    response = client.patch(me_url, headers=headers, json={"full_name": "Foo"})
+    assert response.status_code == 200
+    assert client.get(me_url, headers=headers).json()["full_name"] == "Foo"
+    response = client.patch(
+        f"{me_url}/password",
+        headers=headers,
+        json={"current_password": password, "new_password": random_lower_string()},
+    )
+    assert response.status_code == 200
+
+
+def test_deactivated_user_is_not_cached(
+    client: TestClient, db: Session, superuser_token_headers: dict[str, str]
+) -> None:
+    email, password = random_email(), random_lower_string()
+    user = crud.create_user(
+        session=db, user_create=UserCreate(email=email, password=password)
+    )
+    headers = user_authentication_headers(client=client, email=email, password=password)
+    me_url = f"{settings.API_V1_STR}/users/me"
+    assert client.get(me_url, headers=headers).status_code == 200
+
+    response = client.patch(
+        f"{settings.API_V1_STR}/users/{user.id}",
+        headers=superuser_token_headers,
+        json={"is_active": False},
+    )
+    assert response.status_code == 200
+    response = client.get(me_url, headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Inactive user"
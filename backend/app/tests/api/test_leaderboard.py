@@ -0,0 +1,76 @@
+import asyncio
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlmodel import Session
+
+from app.api.leaderboard import Board, Leaderboard
+from app.models import QuestionPublic
+from app.tests.utils.event import create_random_event
+from app.tests.utils.question import create_random_question
+
+pytestmark = pytest.mark.anyio
+
+
+def make_question(like_count: int = 0) -> QuestionPublic:
+    return QuestionPublic(
+        id=uuid.uuid4(),
+        event_id=uuid.uuid4(),
+        parent_id=None,
+        content="Question",
+        like_count=like_count,
+        inserted_at=datetime.now(),
+    )
+
+
+def test_board_ranks_by_likes_then_id() -> None:
+    board = Board()
+    questions = [make_question(like_count) for like_count in (1, 3, 1, 0)]
+    for question in questions:
+        board.upsert(question)
+    ties = sorted([questions[0], questions[2]], key=lambda q: q.id, reverse=True)
+    assert board.top(10) == [questions[1], *ties, questions[3]]
+    assert board.top(1) == [questions[1]]
+
+    board.update(questions[3].id, {"like_count": 5})
+    board.remove(questions[1].id)
+    board.update(uuid.uuid4(), {"like_count": 1})
+    assert [q.id for q in board.top(2)] == [questions[3].id, ties[0].id]
+    assert board.top(1)[0].like_count == 5
+    assert len(board) == 3
+
+
+async def test_load_shares_query_and_keeps_changes(db: Session) -> None:
+    event = create_random_event(db)
+    first = create_random_question(db, event.id)
+    second = create_random_question(db, event.id)
+    create_random_question(db, event.id, parent_id=first.id)
+    leaderboard = Leaderboard(ttl=60)
+
+    loads = [asyncio.create_task(leaderboard.top(event.id, 10)) for _ in range(3)]
+    await asyncio.sleep(0)
+    # Made while the board loads, must not be lost
+    leaderboard.update(event.id, second.id, like_count=4)
+    results = await asyncio.gather(*loads)
+
+    assert leaderboard.is_loaded(event.id)
+    for questions, count in results:
+        assert count == 2
+        assert [q.id for q in questions] == [second.id, first.id]
+        assert questions[0].like_count == 4
+        assert questions[1].followup_count == 1
+
+
+async def test_expired_board_is_reloaded(db: Session) -> None:
+    event = create_random_event(db)
+    question = create_random_question(db, event.id)
+    leaderboard = Leaderboard(ttl=0)
+    await leaderboard.top(event.id, 10)
+    assert not leaderboard.is_loaded(event.id)
+
+    question.like_count = 7
+    db.add(question)
+    db.commit()
+    questions, _ = await leaderboard.top(event.id, 10)
+    assert questions[0].like_count == 7
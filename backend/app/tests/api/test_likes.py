@@ -0,0 +1,112 @@
+import asyncio
+import json
+import uuid
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+from sqlmodel import Session, select
+
+from app.api.likes import SHUTDOWN_FLUSH_ATTEMPTS, LikeAggregator
+from app.api.websockets.connection import ConnectionManager
+from app.models import Question
+from app.tests.utils.event import create_random_event
+from app.tests.utils.question import create_random_question
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeWebSocket:
+    def __init__(self) -> None:
+        self.sent: list[str] = []
+
+    async def send(self, message: dict[str, Any]) -> None:
+        self.sent.append(message["text"])
+
+
+async def test_flush_coalesces_likes(db: Session) -> None:
+    event = create_random_event(db)
+    first = create_random_question(db, event.id)
+    second = create_random_question(db, event.id)
+    manager = ConnectionManager()
+    websocket: Any = FakeWebSocket()
+    await manager.connect(websocket, str(event.id))
+    aggregator = LikeAggregator(manager, flush_interval=60)
+
+    for _ in range(5):
+        aggregator.add(event.id, first.id)
+    assert aggregator.add(event.id, second.id) == 1
+    assert aggregator.pending(first.id) == 5
+    await aggregator.flush()
+    await asyncio.sleep(0.01)
+
+    assert aggregator.pending(first.id) == 0
+    db.refresh(first)
+    db.refresh(second)
+    assert first.like_count == 5
+    assert second.like_count == 1
+    messages = {
+        message["data"]["id"]: message for message in map(json.loads, websocket.sent)
+    }
+    assert len(websocket.sent) == 2
+    assert messages[str(first.id)]["type"] == "question_liked"
+    assert messages[str(first.id)]["data"]["like_count"] == 5
+    manager.disconnect(websocket, str(event.id))
+
+
+async def test_flush_without_likes_is_noop() -> None:
+    manager = ConnectionManager()
+    aggregator = LikeAggregator(manager, flush_interval=60)
+    await aggregator.flush()
+
+
+class FlakyAggregator(LikeAggregator):
+    def __init__(self, failures: int) -> None:
+        super().__init__(ConnectionManager(), flush_interval=60)
+        self.failures = failures
+        self.flushed: list[int] = []
+
+    async def flush(self) -> None:
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("database unavailable")
+        self.flushed.append(sum(n for _, n in self._pending.values()))
+        self._pending = {}
+
+
+async def test_shutdown_retries_flush() -> None:
+    aggregator = FlakyAggregator(failures=2)
+    aggregator.add(uuid.uuid4(), uuid.uuid4())
+    with patch("app.api.likes.SHUTDOWN_FLUSH_RETRY_SECONDS", 0):
+        await aggregator.shutdown()
+    assert aggregator.flushed == [1]
+
+
+async def test_shutdown_gives_up_on_flush() -> None:
+    aggregator = FlakyAggregator(failures=10)
+    question_id = uuid.uuid4()
+    aggregator.add(uuid.uuid4(), question_id)
+    with patch("app.api.likes.SHUTDOWN_FLUSH_RETRY_SECONDS", 0):
+        await aggregator.shutdown()
+    assert aggregator.failures == 10 - SHUTDOWN_FLUSH_ATTEMPTS
+    assert aggregator.pending(question_id) == 0
+
+
+async def test_shutdown_waits_for_the_flush_in_progress(db: Session) -> None:
+    event = create_random_event(db)
+    question = create_random_question(db, event.id)
+    aggregator = LikeAggregator(ConnectionManager(), flush_interval=0.01)
+    await aggregator.startup()
+    # The flush blocks on the row until this transaction ends
+    db.exec(select(Question).where(Question.id == question.id).with_for_update())
+    aggregator.add(event.id, question.id)
+    await asyncio.sleep(0.1)
+    assert aggregator.pending(question.id) == 0
+
+    shutdown = asyncio.create_task(aggregator.shutdown())
+    await asyncio.sleep(0.1)
+    assert not shutdown.done()
+    db.rollback()
+    await shutdown
+    db.refresh(question)
+    assert question.like_count == 1
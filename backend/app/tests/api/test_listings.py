@@ -0,0 +1,43 @@
+import uuid
+
+from app.api.listings import Listing, ListingCache, ListingKey
+
+
+def key(event_id: uuid.UUID, limit: int = 100) -> ListingKey:
+    return (event_id, None, None, "desc", limit, True)
+
+
+def test_etag_depends_on_the_content_only() -> None:
+    assert Listing.of(b"[]").etag == Listing.of(b"[]").etag
+    assert Listing.of(b"[]").etag != Listing.of(b"[1]").etag
+
+
+def test_matches_if_none_match() -> None:
+    listing = Listing.of(b"[]")
+    assert listing.matches(listing.etag)
+    assert listing.matches(f'"other", W/{listing.etag}')
+    assert listing.matches("*")
+    assert not listing.matches('"other"')
+    assert not listing.matches(None)
+
+
+def test_bump_invalidates_the_event() -> None:
+    cache = ListingCache(ttl=60, size=10)
+    event_id, other_id = uuid.uuid4(), uuid.uuid4()
+    listing = Listing.of(b"[]")
+    cache.put(key(event_id), cache.version(event_id), listing)
+    cache.put(key(other_id), cache.version(other_id), listing)
+    assert cache.get(key(event_id)) is listing
+
+    cache.bump(event_id)
+    assert cache.get(key(event_id)) is None
+    assert cache.get(key(other_id)) is listing
+
+
+def test_put_skips_listings_read_before_a_change() -> None:
+    cache = ListingCache(ttl=60, size=10)
+    event_id = uuid.uuid4()
+    version = cache.version(event_id)
+    cache.bump(event_id)
+    cache.put(key(event_id), version, Listing.of(b"[]"))
+    assert cache.get(key(event_id)) is None
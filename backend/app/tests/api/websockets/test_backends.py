@@ -0,0 +1,120 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import Any
+
+import orjson
+import pytest
+from sqlalchemy import make_url
+
+from app.api.websockets.backends import MemoryBackend, PostgresBackend
+from app.api.websockets.connection import ConnectionManager
+from app.api.websockets.messages import new_question
+from app.core.config import settings
+from app.models import Question
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeWebSocket:
+    def __init__(self) -> None:
+        self.sent: list[str] = []
+        self.received = asyncio.Event()
+
+    async def send(self, message: dict[str, Any]) -> None:
+        self.sent.append(message["text"])
+        self.received.set()
+
+
+def postgres_conninfo() -> str:
+    url = make_url(str(settings.SQLALCHEMY_DATABASE_URI))
+    return url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+async def test_memory_backend_delivers_to_every_subscriber() -> None:
+    backend = MemoryBackend()
+    first = backend.subscribe()
+    second = backend.subscribe()
+    await backend.publish("event", "message")
+    assert await anext(first) == ("event", "message")
+    assert await anext(second) == ("event", "message")
+
+
+async def test_postgres_backend_delivers_across_connections() -> None:
+    publisher = PostgresBackend(postgres_conninfo(), channel="test_broadcast")
+    subscriber = PostgresBackend(postgres_conninfo(), channel="test_broadcast")
+    await publisher.connect()
+    await subscriber.connect()
+    try:
+        messages = subscriber.subscribe()
+        await publisher.publish("event", '{"type": "new_question"}')
+        received = await asyncio.wait_for(anext(messages), timeout=5)
+        assert received == ("event", '{"type": "new_question"}')
+    finally:
+        await publisher.disconnect()
+        await subscriber.disconnect()
+
+
+async def test_longest_question_fits_in_a_notify() -> None:
+    publisher = PostgresBackend(postgres_conninfo(), channel="test_long")
+    subscriber = PostgresBackend(postgres_conninfo(), channel="test_long")
+    await publisher.connect()
+    await subscriber.connect()
+    event_id = str(uuid.uuid4())
+    question = Question(
+        id=uuid.uuid4(),
+        event_id=uuid.uuid4(),
+        parent_id=uuid.uuid4(),
+        title="😀" * 255,
+        content="😀" * 1000,
+        user_name="😀" * 255,
+        like_count=1_000_000,
+        followup_count=1_000_000,
+        inserted_at=datetime.now(timezone.utc),
+    )
+    message = orjson.dumps(new_question(question)).decode()
+    try:
+        messages = subscriber.subscribe()
+        await publisher.publish(event_id, message)
+        received = await asyncio.wait_for(anext(messages), timeout=5)
+        assert received == (event_id, message)
+    finally:
+        await publisher.disconnect()
+        await subscriber.disconnect()
+
+
+async def test_broadcast_reaches_sockets_on_other_workers() -> None:
+    workers = [
+        ConnectionManager(PostgresBackend(postgres_conninfo(), channel="test_fanout"))
+        for _ in range(2)
+    ]
+    for worker in workers:
+        await worker.startup()
+    try:
+        websocket: Any = FakeWebSocket()
+        await workers[1].connect(websocket, "event")
+        await workers[0].broadcast("event", {"type": "question_liked"})
+        await asyncio.wait_for(websocket.received.wait(), timeout=5)
+        assert json.loads(websocket.sent[0]) == {"type": "question_liked", "seq": 1}
+    finally:
+        for worker in workers:
+            await worker.shutdown()
+
+
+class FailingBackend(MemoryBackend):
+    async def publish(self, event_id: str, message: str) -> None:
+        raise ConnectionError("the database went away")
+
+
+async def test_failed_publish_delivers_locally() -> None:
+    manager = ConnectionManager(FailingBackend())
+    await manager.startup()
+    try:
+        websocket: Any = FakeWebSocket()
+        await manager.connect(websocket, "event")
+        await manager.broadcast("event", {"type": "question_liked"})
+        await asyncio.wait_for(websocket.received.wait(), timeout=5)
+        assert json.loads(websocket.sent[0]) == {"type": "question_liked", "seq": 1}
+    finally:
+        await manager.shutdown()
@@ -0,0 +1,325 @@
+import asyncio
+import json
+import time
+from typing import Any
+from unittest.mock import AsyncMock
+from uuid import uuid4
+
+import msgpack
+import pytest
+from prometheus_client import REGISTRY
+
+from app.api.websockets.connection import RESYNC, ConnectionManager, EventFull
+from app.api.websockets.encodings import JSON, MSGPACK
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float = 0) -> None:
+        self.delay = delay
+        self.sent: list[Any] = []
+        self.closed = False
+
+    async def send(self, message: dict[str, Any]) -> None:
+        await asyncio.sleep(self.delay)
+        self.sent.append(message.get("text", message.get("bytes")))
+
+    async def close(self, code: int = 1000) -> None:  # noqa: ARG002
+        self.closed = True
+
+
+async def test_broadcast_does_not_wait_for_slow_sockets() -> None:
+    manager = ConnectionManager(send_timeout=0.1)
+    slow: Any = FakeWebSocket(delay=10)
+    fast: Any = FakeWebSocket()
+    await manager.connect(slow, "event")
+    await manager.connect(fast, "event")
+
+    start = time.monotonic()
+    await manager.broadcast("event", {"type": "question_liked"})
+    assert time.monotonic() - start < 0.1
+
+    await asyncio.sleep(0.01)
+    assert [json.loads(message) for message in fast.sent] == [
+        {"type": "question_liked", "seq": 1}
+    ]
+
+
+async def test_send_timeout_drops_socket() -> None:
+    manager = ConnectionManager(send_timeout=0.05)
+    slow: Any = FakeWebSocket(delay=10)
+    await manager.connect(slow, "event")
+    await manager.broadcast("event", {"type": "question_liked"})
+    await asyncio.sleep(0.2)
+    assert slow.closed
+    assert "event" not in manager._connections
+
+
+async def test_full_queue_gets_resync_then_drop() -> None:
+    manager = ConnectionManager(send_timeout=10, send_queue_size=2)
+    slow: Any = FakeWebSocket(delay=10)
+    await manager.connect(slow, "event")
+    for i in range(4):
+        await manager.broadcast("event", {"type": "question_liked", "i": i})
+    connection = manager._connections["event"][slow]
+    assert connection.lagging
+    assert RESYNC.send_message(JSON) in connection.queue._queue  # type: ignore[attr-defined]
+
+    for i in range(4):
+        await manager.broadcast("event", {"type": "question_liked", "i": i})
+    await asyncio.sleep(0.01)
+    assert "event" not in manager._connections
+    assert slow.closed
+
+
+async def test_disconnect_stops_sender() -> None:
+    manager = ConnectionManager()
+    websocket: Any = FakeWebSocket()
+    await manager.connect(websocket, "event")
+    sender = manager._connections["event"][websocket].sender
+    manager.disconnect(websocket, "event")
+    await asyncio.sleep(0)
+    assert sender is not None and sender.cancelled()
+    assert "event" not in manager._connections
+
+
+async def test_connect_sends_snapshot_then_deltas() -> None:
+    manager = ConnectionManager()
+    websocket: Any = FakeWebSocket()
+    await manager.broadcast("event", {"type": "question_liked"})
+
+    async def load_snapshot() -> dict[str, Any]:
+        await manager.broadcast("event", {"type": "question_liked", "i": 0})
+        return {"questions": []}
+
+    await manager.connect(websocket, "event", load_snapshot=load_snapshot)
+    await manager.broadcast("event", {"type": "question_liked", "i": 1})
+    await asyncio.sleep(0.01)
+
+    snapshot, *deltas = map(json.loads, websocket.sent)
+    assert snapshot["type"] == "snapshot"
+    assert snapshot["seq"] == 0
+    assert snapshot["data"] == {"questions": []}
+    # The delta broadcast while loading is replayed after the snapshot
+    assert [(delta["seq"], delta["i"]) for delta in deltas] == [(1, 0), (2, 1)]
+
+
+async def test_reconnect_gets_missed_deltas_only() -> None:
+    manager = ConnectionManager(replay_size=3)
+    load_snapshot = AsyncMock(return_value={"questions": []})
+    first: Any = FakeWebSocket()
+    await manager.connect(first, "event", load_snapshot=load_snapshot)
+    await manager.broadcast("event", {"type": "question_liked"})
+    await asyncio.sleep(0.01)
+    epoch = json.loads(first.sent[0])["epoch"]
+    manager.disconnect(first, "event")
+
+    for _ in range(2):
+        await manager.broadcast("event", {"type": "question_liked"})
+    resumed: Any = FakeWebSocket()
+    await manager.connect(
+        resumed, "event", since=1, epoch=epoch, load_snapshot=load_snapshot
+    )
+    await asyncio.sleep(0.01)
+    assert [json.loads(message)["seq"] for message in resumed.sent] == [2, 3]
+    assert load_snapshot.await_count == 1
+
+    # Out of the buffer or another epoch, start over from a snapshot
+    for since, resume_epoch in [(0, epoch), (3, "other"), (99, epoch)]:
+        await manager.broadcast("event", {"type": "question_liked"})
+        websocket: Any = FakeWebSocket()
+        await manager.connect(
+            websocket,
+            "event",
+            since=since,
+            epoch=resume_epoch,
+            load_snapshot=load_snapshot,
+        )
+        await asyncio.sleep(0.01)
+        assert json.loads(websocket.sent[0])["type"] == "snapshot"
+    assert load_snapshot.await_count == 4
+
+
+async def test_concurrent_connects_share_snapshot() -> None:
+    manager = ConnectionManager()
+    load_snapshot = AsyncMock(return_value={"questions": []})
+    websockets: list[Any] = [FakeWebSocket() for _ in range(5)]
+    await asyncio.gather(
+        *(
+            manager.connect(websocket, "event", load_snapshot=load_snapshot)
+            for websocket in websockets
+        )
+    )
+    await asyncio.sleep(0.01)
+    assert load_snapshot.await_count == 1
+    # Encoded once for all of them
+    assert all(websocket.sent[0] is websockets[0].sent[0] for websocket in websockets)
+
+
+async def test_snapshot_is_reused_until_the_next_delta() -> None:
+    manager = ConnectionManager()
+    load_snapshot = AsyncMock(return_value={"questions": []})
+    websockets: list[Any] = [FakeWebSocket() for _ in range(3)]
+    for websocket in websockets[:2]:
+        await manager.connect(websocket, "event", load_snapshot=load_snapshot)
+    await asyncio.sleep(0.01)
+    assert load_snapshot.await_count == 1
+    assert websockets[1].sent[0] is websockets[0].sent[0]
+
+    await manager.broadcast("event", {"type": "question_liked"})
+    await manager.connect(websockets[2], "event", load_snapshot=load_snapshot)
+    await asyncio.sleep(0.01)
+    assert load_snapshot.await_count == 2
+    assert json.loads(websockets[2].sent[0])["seq"] == 1
+
+
+async def test_idle_streams_are_dropped() -> None:
+    manager = ConnectionManager(replay_retention=0)
+    websocket: Any = FakeWebSocket()
+    await manager.connect(websocket, "event")
+    manager.disconnect(websocket, "event")
+    await manager.connect(websocket, "other")
+    assert "event" not in manager._streams
+    assert "other" in manager._streams
+
+
+async def test_broadcast_from_other_worker_is_parsed_for_msgpack_only() -> None:
+    manager = ConnectionManager()
+    text: Any = FakeWebSocket()
+    await manager.connect(text, "event")
+    # As received from the backend, serialized by the worker that sent it
+    manager._send_local("event", '{"type":"question_liked"}')
+    await asyncio.sleep(0.01)
+    assert text.sent == ['{"type":"question_liked","seq":1}']
+    frame = manager._streams["event"].deltas[-1][1]
+    assert frame._message is None
+
+    binary: Any = FakeWebSocket()
+    epoch = manager._streams["event"].epoch
+    await manager.connect(binary, "event", since=0, epoch=epoch, encoding=MSGPACK)
+    await asyncio.sleep(0.01)
+    assert msgpack.unpackb(binary.sent[0]) == {"type": "question_liked", "seq": 1}
+
+
+async def test_broadcast_of_unserializable_message_is_logged(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    manager = ConnectionManager()
+    websocket: Any = FakeWebSocket()
+    await manager.connect(websocket, "event")
+    await manager.broadcast("event", {"type": "question_liked", "data": object()})
+    await asyncio.sleep(0.01)
+    assert websocket.sent == []
+    assert "Serializing a broadcast for event event failed" in caplog.text
+
+
+async def test_broadcast_encodes_once_per_encoding() -> None:
+    manager = ConnectionManager()
+    text: list[Any] = [FakeWebSocket() for _ in range(2)]
+    binary: list[Any] = [FakeWebSocket() for _ in range(2)]
+    for websocket in text:
+        await manager.connect(websocket, "event")
+    for websocket in binary:
+        await manager.connect(websocket, "event", encoding=MSGPACK)
+    await manager.broadcast("event", {"type": "question_liked", "data": {"id": "1"}})
+    await asyncio.sleep(0.01)
+
+    expected = {"type": "question_liked", "data": {"id": "1"}, "seq": 1}
+    assert text[0].sent[0] is text[1].sent[0]
+    assert json.loads(text[0].sent[0]) == expected
+    assert binary[0].sent[0] is binary[1].sent[0]
+    assert msgpack.unpackb(binary[0].sent[0]) == expected
+
+
+async def test_reap_drops_idle_clients_and_heartbeats_the_others() -> None:
+    manager = ConnectionManager(idle_timeout=30)
+    idle: Any = FakeWebSocket()
+    live: Any = FakeWebSocket()
+    await manager.connect(idle, "event")
+    await manager.connect(live, "event")
+    manager._connections["event"][idle].last_seen -= 60
+    manager._connections["event"][live].last_seen -= 60
+    manager.touch(live, "event")
+
+    assert manager.reap() == 1
+    await asyncio.sleep(0.01)
+    assert idle.closed
+    assert list(manager._connections["event"]) == [live]
+    assert [json.loads(message) for message in live.sent] == [{"type": "heartbeat"}]
+
+
+async def test_stats() -> None:
+    manager = ConnectionManager(send_queue_size=1)
+    slow: Any = FakeWebSocket(delay=10)
+    await manager.connect(slow, "event")
+    await manager.connect(FakeWebSocket(), "other")  # type: ignore[arg-type]
+    for _ in range(2):
+        await manager.broadcast("event", {"type": "question_liked"})
+
+    assert manager.stats() == {
+        "event": {"connections": 1, "lagging": 1, "queued": 1},
+        "other": {"connections": 1, "lagging": 0, "queued": 0},
+    }
+    manager.disconnect(slow, "event")
+
+
+async def test_connection_cap() -> None:
+    manager = ConnectionManager(max_connections_per_event=1)
+    await manager.connect(FakeWebSocket(), "event")  # type: ignore[arg-type]
+    with pytest.raises(EventFull):
+        await manager.connect(FakeWebSocket(), "event")  # type: ignore[arg-type]
+    await manager.connect(FakeWebSocket(), "other")  # type: ignore[arg-type]
+
+
+async def test_connection_metrics() -> None:
+    def sample(name: str, **labels: str) -> float:
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    event_id = str(uuid4())
+    connections = sample("ws_connections")
+    full = sample("ws_dropped_connections_total", reason="full")
+    manager = ConnectionManager(max_connections_per_event=1)
+    websocket: Any = FakeWebSocket()
+    await manager.connect(websocket, event_id)
+    assert sample("ws_connections") == connections + 1
+    with pytest.raises(EventFull):
+        await manager.connect(FakeWebSocket(), event_id)  # type: ignore[arg-type]
+    assert sample("ws_dropped_connections_total", reason="full") == full + 1
+
+    manager.disconnect(websocket, event_id)
+    assert sample("ws_connections") == connections
+
+
+class CountingWebSocket(FakeWebSocket):
+    in_flight = 0
+    max_in_flight = 0
+
+    async def send(self, message: dict[str, Any]) -> None:
+        cls = type(self)
+        cls.in_flight += 1
+        cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            await super().send(message)
+        finally:
+            cls.in_flight -= 1
+
+
+async def test_events_take_turns_sending() -> None:
+    manager = ConnectionManager(event_send_concurrency=4)
+    crowd: list[Any] = [CountingWebSocket(delay=0.01) for _ in range(40)]
+    for websocket in crowd:
+        await manager.connect(websocket, "keynote")
+    small: Any = FakeWebSocket()
+    await manager.connect(small, "small")
+
+    await manager.broadcast("keynote", {"type": "question_liked"})
+    await manager.broadcast("small", {"type": "question_liked"})
+    await asyncio.sleep(0.005)
+    # Doesn't wait for the keynote's 40 sends, which go 4 at a time
+    assert len(small.sent) == 1
+    assert sum(len(websocket.sent) for websocket in crowd) < 40
+
+    await asyncio.sleep(0.2)
+    assert all(len(websocket.sent) == 1 for websocket in crowd)
+    assert CountingWebSocket.max_in_flight == 4
@@ -0,0 +1,18 @@
+from pathlib import Path
+
+import pytest
+
+BENCHMARKS = Path(__file__).parent
+
+
+def pytest_collection_modifyitems(
+    config: pytest.Config, items: list[pytest.Item]
+) -> None:
+    # Seeding 10k questions has no place in the regular test run, the
+    # benchmarks only run with `scripts/benchmark.sh` (--benchmark-only)
+    if config.getoption("benchmark_only"):
+        return
+    skip = pytest.mark.skip(reason="benchmarks run with --benchmark-only")
+    for item in items:
+        if BENCHMARKS in item.path.parents:
+            item.add_marker(skip)
@@ -0,0 +1,57 @@
+import asyncio
+from collections.abc import Iterator
+from typing import Any
+
+import pytest
+
+from app.api.websockets.connection import ConnectionManager
+from app.api.websockets.encodings import JSON, MSGPACK
+from app.benchmarks.broadcast import Countdown, sample_message
+
+
+class CountingWebSocket:
+    def __init__(self, deliveries: list[Countdown]) -> None:
+        self.deliveries = deliveries
+
+    async def send(self, message: dict[str, Any]) -> None:  # noqa: ARG002
+        self.deliveries[0].count_down()
+
+
+@pytest.fixture(params=[10, 1_000, 10_000], ids=lambda n: f"{n}ws")
+def recipients(request: pytest.FixtureRequest) -> int:
+    count: int = request.param
+    return count
+
+
+@pytest.fixture
+def loop() -> Iterator[asyncio.AbstractEventLoop]:
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def test_broadcast(
+    benchmark: Any, loop: asyncio.AbstractEventLoop, recipients: int
+) -> None:
+    # From the broadcast to the send on the last socket, half of them JSON and
+    # half MessagePack, so both the encoding and the fan-out are measured
+    manager = ConnectionManager()
+    deliveries = [Countdown(recipients)]
+    websockets: list[Any] = [CountingWebSocket(deliveries) for _ in range(recipients)]
+
+    async def connect() -> None:
+        for i, websocket in enumerate(websockets):
+            await manager.connect(
+                websocket, "event", encoding=MSGPACK if i % 2 else JSON
+            )
+
+    async def broadcast() -> None:
+        deliveries[0] = Countdown(recipients)
+        await manager.broadcast("event", sample_message())
+        await deliveries[0].event.wait()
+
+    loop.run_until_complete(connect())
+    benchmark(lambda: loop.run_until_complete(broadcast()))
+    for websocket in websockets:
+        manager.disconnect(websocket, "event")
+    loop.run_until_complete(asyncio.sleep(0))
@@ -0,0 +1,138 @@
+import random
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.api.listings import listing_cache
+from app.api.routes.questions import build_questions_query
+from app.core.config import settings
+from app.models import Event, Question
+from app.tests.utils.event import create_random_event
+from app.tests.utils.question import create_random_question
+from app.tests.utils.utils import count_statements, random_lower_string
+
+
+def questions_url(event: Event) -> str:
+    return f"{settings.API_V1_STR}/questions/events/{event.id}/questions"
+
+
+@pytest.fixture(scope="module", params=[100, 1_000, 10_000], ids=lambda n: f"{n}q")
+def event(request: pytest.FixtureRequest, db: Session) -> Event:
+    event = create_random_event(db)
+    db.add_all(
+        Question(
+            content=random_lower_string(),
+            event_id=event.id,
+            user_name=random_lower_string(),
+            attendee_identifier=random_lower_string(),
+            like_count=random.randint(0, 100),
+        )
+        for _ in range(request.param)
+    )
+    db.commit()
+    return event
+
+
+@pytest.mark.parametrize("sort_by", [None, "likes"])
+def test_build_questions_query(
+    benchmark: Any, db: Session, event: Event, sort_by: str | None
+) -> None:
+    def run() -> list[Question]:
+        query = build_questions_query(event.id, None, sort_by, "desc")
+        return list(db.exec(query.limit(100)).all())
+
+    questions = benchmark(run)
+    assert len(questions) == 100
+
+
+@pytest.mark.parametrize("sort_by", [None, "likes"])
+def test_list_questions(
+    benchmark: Any, client: TestClient, db: Session, event: Event, sort_by: str | None
+) -> None:
+    params = {"sort_by": sort_by} if sort_by else {}
+    # The statements of a page don't depend on the size of the event, an N+1
+    # loop shows up here before it shows up in the timings. Without the
+    # listing cache, so that every request reads the database.
+    with patch.object(listing_cache, "ttl", 0):
+        with count_statements() as empty:
+            client.get(questions_url(create_random_event(db)), params=params)
+        with count_statements() as statements:
+            response = client.get(questions_url(event), params=params)
+        assert len(statements) == len(empty)
+        benchmark.extra_info["statements"] = len(statements)
+
+        response = benchmark(client.get, questions_url(event), params=params)
+    assert response.status_code == 200
+    assert len(response.json()["data"]) == 100
+
+
+@pytest.mark.parametrize("sort_by", [None, "likes"])
+def test_revalidate_questions(
+    benchmark: Any, client: TestClient, event: Event, sort_by: str | None
+) -> None:
+    # What every poller does between changes, answered from the listing cache
+    params = {"sort_by": sort_by} if sort_by else {}
+    etag = client.get(questions_url(event), params=params).headers["ETag"]
+    headers = {"If-None-Match": etag}
+
+    response = benchmark(
+        client.get, questions_url(event), params=params, headers=headers
+    )
+    assert response.status_code == 304
+
+
+@pytest.fixture(scope="module")
+def executor() -> Iterator[ThreadPoolExecutor]:
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        yield executor
+
+
+@pytest.mark.parametrize("likes", [16, 64])
+def test_like_question_concurrently(
+    benchmark: Any,
+    client: TestClient,
+    db: Session,
+    executor: ThreadPoolExecutor,
+    likes: int,
+) -> None:
+    # Every like of a round hits the same row, the worst case for its lock
+    event = create_random_event(db)
+    question = create_random_question(db, event.id)
+    url = f"{questions_url(event)}/{question.id}/like"
+
+    def burst() -> None:
+        responses = list(executor.map(lambda _: client.post(url), range(likes)))
+        assert all(response.status_code == 200 for response in responses)
+
+    benchmark.pedantic(burst, rounds=10)
+    db.refresh(question)
+    assert question.like_count == 10 * likes
+
+
+def test_create_followup(benchmark: Any, client: TestClient, db: Session) -> None:
+    event = create_random_event(db)
+    parent = create_random_question(db, event.id)
+    created = []
+
+    def create() -> Any:
+        response = client.post(
+            questions_url(event),
+            params={
+                "user_name": "Benchmark",
+                "attendee_identifier": "benchmark",
+                "parent_id": str(parent.id),
+            },
+            json={"content": random_lower_string()},
+        )
+        created.append(response)
+        return response
+
+    response = benchmark(create)
+    assert response.status_code == 200
+    db.refresh(parent)
+    assert parent.followup_count == len(created)
@@ -0,0 +1,31 @@
+from unittest.mock import patch
+
+from app.core.cache import TTLCache
+
+
+def test_entries_expire() -> None:
+    cache: TTLCache[str, int] = TTLCache(ttl=2, size=10)
+    with patch("app.core.cache.time.monotonic", return_value=100):
+        cache.put("a", 1)
+    with patch("app.core.cache.time.monotonic", return_value=101):
+        assert cache.get("a") == 1
+    with patch("app.core.cache.time.monotonic", return_value=103):
+        assert cache.get("a") is None
+    assert not cache
+
+
+def test_least_recently_used_is_evicted() -> None:
+    cache: TTLCache[str, int] = TTLCache(ttl=60, size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_zero_ttl_disables_the_cache() -> None:
+    cache: TTLCache[str, int] = TTLCache(ttl=0, size=10)
+    cache.put("a", 1)
+    assert cache.get("a") is None
@@ -0,0 +1,9 @@
+import pytest
+from pydantic import ValidationError
+
+from app.core.config import Settings
+
+
+def test_pgbouncer_rejects_statement_timeout() -> None:
+    with pytest.raises(ValidationError, match="statement_timeout"):
+        Settings(DB_PGBOUNCER=True, DB_STATEMENT_TIMEOUT_MS=1000)  # type: ignore
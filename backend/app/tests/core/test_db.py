@@ -0,0 +1,78 @@
+import logging
+import threading
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.db import TimedQueuePool, async_engine, engine_options, track_queries
+
+
+def test_track_queries_counts_statements(db: Session) -> None:
+    with track_queries() as stats:
+        db.execute(text("SELECT 1"))
+        db.execute(text("SELECT 2"))
+    assert stats.statements == 2
+    assert stats.duration > 0
+
+    db.execute(text("SELECT 3"))
+    assert stats.statements == 2
+
+
+@pytest.mark.anyio
+async def test_track_queries_counts_async_statements() -> None:
+    with track_queries() as stats:
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+    assert stats.statements == 1
+
+
+def test_slow_query_is_logged(db: Session, caplog: pytest.LogCaptureFixture) -> None:
+    with (
+        patch.object(settings, "DB_SLOW_QUERY_MS", 10),
+        caplog.at_level(logging.WARNING, logger="app.core.db"),
+    ):
+        db.execute(text("SELECT pg_sleep(0.02)"))
+        db.execute(text("SELECT 1"))
+    assert len(caplog.records) == 1
+    assert "pg_sleep" in caplog.records[0].getMessage()
+
+
+def test_saturated_pool_is_logged(caplog: pytest.LogCaptureFixture) -> None:
+    engine = create_engine(
+        str(settings.SQLALCHEMY_DATABASE_URI),
+        poolclass=TimedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+    )
+    with caplog.at_level(logging.WARNING, logger="app.core.db"):
+        with engine.connect():
+            pass
+        assert not caplog.records
+
+        held = engine.connect()
+        threading.Timer(0.05, held.close).start()
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    engine.dispose()
+    records = [record for record in caplog.records if record.name == "app.core.db"]
+    assert len(records) == 1
+    assert "saturated" in records[0].getMessage()
+
+
+def test_statement_timeout() -> None:
+    with patch.object(settings, "DB_STATEMENT_TIMEOUT_MS", 1500):
+        engine = create_engine(
+            str(settings.SQLALCHEMY_DATABASE_URI), **engine_options()
+        )
+    with engine.connect() as connection:
+        assert connection.execute(text("SHOW statement_timeout")).scalar() == "1500ms"
+    engine.dispose()
+
+
+def test_pgbouncer_disables_prepared_statements() -> None:
+    with patch.object(settings, "DB_PGBOUNCER", True):
+        options = engine_options()
+    assert options["connect_args"] == {"prepare_threshold": None}
@@ -0,0 +1,36 @@
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.tests.utils.event import create_random_event
+from app.tests.utils.question import create_random_question
+from app.tests.utils.utils import count_statements
+
+
+def test_query_stats_headers(client: TestClient, db: Session) -> None:
+    event = create_random_event(db)
+    create_random_question(db, event.id)
+    with count_statements() as statements:
+        response = client.get(
+            f"{settings.API_V1_STR}/questions/events/{event.id}/questions"
+        )
+    assert response.status_code == 200
+    assert response.headers["X-DB-Statements"] == str(len(statements))
+    assert response.headers["Server-Timing"].startswith("db;dur=")
+
+
+def test_query_stats_headers_not_in_production(client: TestClient, db: Session) -> None:
+    event = create_random_event(db)
+    with (
+        patch.object(settings, "ENVIRONMENT", "production"),
+        patch("sentry_sdk.set_measurement") as set_measurement,
+    ):
+        response = client.get(
+            f"{settings.API_V1_STR}/questions/events/{event.id}/questions"
+        )
+    assert response.status_code == 200
+    assert "X-DB-Statements" not in response.headers
+    assert "Server-Timing" not in response.headers
+    set_measurement.assert_any_call("db_statements", 3)
@@ -0,0 +1,42 @@
+import threading
+
+import pytest
+
+from app.core.config import settings
+from app.core.metrics import PASSWORD_HASH_REJECTED
+from app.core.security import (
+    PasswordHasher,
+    PasswordHasherBusy,
+    get_password_hash,
+    verify_password,
+)
+
+
+def test_password_hash_uses_the_configured_rounds() -> None:
+    hashed = get_password_hash("secret")
+    assert hashed.startswith(f"$2b${settings.PASSWORD_HASH_ROUNDS:02d}$")
+    assert verify_password("secret", hashed)
+    assert not verify_password("other", hashed)
+
+
+def test_password_hasher_turns_away_beyond_its_queue() -> None:
+    hasher = PasswordHasher(workers=1, queue_size=0)
+    started, release = threading.Event(), threading.Event()
+
+    def hash_slowly() -> str:
+        started.set()
+        release.wait()
+        return "hashed"
+
+    running = threading.Thread(target=hasher.run, args=(hash_slowly,))
+    running.start()
+    started.wait()
+
+    rejected = PASSWORD_HASH_REJECTED._value.get()
+    with pytest.raises(PasswordHasherBusy):
+        hasher.run(hash_slowly)
+    assert PASSWORD_HASH_REJECTED._value.get() == rejected + 1
+
+    release.set()
+    running.join()
+    assert hasher.run(hash_slowly) == "hashed"
@@ -0,0 +1,16 @@
+from sqlmodel import Session
+
+from app.models import Event
+from app.tests.utils.user import create_random_user
+from app.tests.utils.utils import random_lower_string
+from app.utils import generate_event_code
+
+
+def create_random_event(db: Session) -> Event:
+    user = create_random_user(db)
+    name = random_lower_string()
+    event = Event(name=name, owner_id=user.id, code=generate_event_code())
+    db.add(event)
+    db.commit()
+    db.refresh(event)
+    return event
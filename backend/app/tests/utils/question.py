@@ -0,0 +1,29 @@
+import uuid
+
+from sqlmodel import Session, col, update
+
+from app.models import Question
+from app.tests.utils.utils import random_lower_string
+
+
+def create_random_question(
+    db: Session, event_id: uuid.UUID, parent_id: uuid.UUID | None = None
+) -> Question:
+    question = Question(
+        content=random_lower_string(),
+        event_id=event_id,
+        parent_id=parent_id,
+        user_name=random_lower_string(),
+        attendee_identifier=random_lower_string(),
+    )
+    db.add(question)
+    if parent_id:
+        # Keep the denormalized count in step, as create_question does
+        db.exec(
+            update(Question)  # type: ignore
+            .where(col(Question.id) == parent_id)
+            .values(followup_count=Question.followup_count + 1)
+        )
+    db.commit()
+    db.refresh(question)
+    return question
@@ -1,5 +1,5 @@
-import base64
 import logging
+import secrets
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
@@ -124,9 +124,18 @@ def verify_password_reset_token(token: str) -> str | None:
         return None
 
 
-def generate_event_code(event_name: str) -> str:
-    timestamp = str(int(datetime.now(timezone.utc).timestamp()))
-    base64_name = base64.b64encode((event_name + timestamp).encode("utf-8")).decode(
-        "utf-8"
+# Without the look-alike 0/O and 1/I/L, codes are typed in by attendees
+EVENT_CODE_ALPHABET = "23456789ABCDEFGHJKMNPQRSTUVWXYZ"
+EVENT_CODE_LENGTH = 8
+
+
+def generate_event_code() -> str:
+    """
+    A random join code, about 40 bits of entropy.
+
+    Collisions are unlikely but not impossible, the unique index on
+    `event.code` catches them and `new_event` draws again.
+    """
+    return "".join(
+        secrets.choice(EVENT_CODE_ALPHABET) for _ in range(EVENT_CODE_LENGTH)
     )
-    return base64_name[:10]
@@ -0,0 +1,13 @@
+#!/usr/bin/env bash
+
+set -e
+set -x
+
+# Each run is saved under .benchmarks, and fails when a benchmark got slower
+# than in the last saved run by more than the threshold
+compare=()
+if ls .benchmarks/*/*.json > /dev/null 2>&1; then
+    compare=(--benchmark-compare --benchmark-compare-fail="median:${BENCHMARK_THRESHOLD:-25%}")
+fi
+pytest app/tests/benchmarks --benchmark-only --benchmark-group-by=func \
+    --benchmark-autosave "${compare[@]}" "${@}"
@@ -0,0 +1,12 @@
+#! /usr/bin/env bash
+
+set -e
+
+# The workers share their metrics through files in there, the ones left by
+# the workers of a previous run would be counted with theirs
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
+exec fastapi run --workers 4 app/main.py
@@ -451,6 +451,9 @@ export class QuestionsService {
    * @param data.sortBy
    * @param data.order
    * @param data.parentId
+   * @param data.limit
+   * @param data.cursor
+   * @param data.withCount
    * @returns QuestionsPublic Successful Response
    * @throws ApiError
    */
@@ -467,6 +470,9 @@ export class QuestionsService {
         sort_by: data.sortBy,
         order: data.order,
         parent_id: data.parentId,
+        limit: data.limit,
+        cursor: data.cursor,
+        with_count: data.withCount,
       },
       errors: {
         422: "Validation Error",
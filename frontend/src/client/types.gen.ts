@@ -106,7 +106,8 @@ export type QuestionPublic = {
 
 export type QuestionsPublic = {
   data: Array<QuestionPublic>
-  count: number
+  count?: number | null
+  next_cursor?: string | null
 }
 
 export type QuestionUpdate = {
@@ -268,10 +269,13 @@ export type PrivateCreateUserData = {
 export type PrivateCreateUserResponse = UserPublic
 
 export type QuestionsListQuestionsData = {
+  cursor?: string | null
   eventId: string
+  limit?: number
   order?: "asc" | "desc"
   parentId?: string | null
   sortBy?: "created_at" | "likes"
+  withCount?: boolean
 }
 
 export type QuestionsListQuestionsResponse = QuestionsPublic
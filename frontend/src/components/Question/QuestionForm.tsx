@@ -132,6 +132,7 @@ const QuestionInput = ({ id, content, setContent, parentId, bgColor, t }: Questi
       id={id}
       value={content}
       onChange={(e) => setContent(e.target.value)}
+      maxLength={1000}
       placeholder={parentId ? t('event.question.followUpPlaceholder') : t('event.question.placeholder')}
       minH="100px"
       bg={bgColor}
@@ -10,6 +10,8 @@ import theme from "./theme"
 import './i18n'
 
 OpenAPI.BASE = import.meta.env.VITE_API_URL
+// The API flags clients that just wrote with a cookie, to read their writes
+OpenAPI.WITH_CREDENTIALS = true
 OpenAPI.TOKEN = async () => {
   return localStorage.getItem("access_token") || ""
 }
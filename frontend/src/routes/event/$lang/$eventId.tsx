@@ -14,6 +14,7 @@ import {
   Flex,
 } from "@chakra-ui/react";
 import { QuestionsService, EventsService } from "../../../client/sdk.gen";
+import type { QuestionPublic, QuestionsListQuestionsData } from "../../../client/types.gen";
 import { useTranslation } from 'react-i18next';
 
 const fadeIn = keyframes`
@@ -21,6 +22,31 @@ const fadeIn = keyframes`
   to { opacity: 1; }
 `;
 
+// The listing comes in pages, follow next_cursor until the last one
+const listAllQuestions = async (
+  params: Omit<QuestionsListQuestionsData, "cursor" | "limit" | "withCount">,
+): Promise<QuestionPublic[]> => {
+  const questions: QuestionPublic[] = [];
+  let cursor: string | null | undefined;
+  do {
+    const page = await QuestionsService.listQuestions({
+      ...params,
+      cursor,
+      limit: 500,
+      withCount: false,
+    });
+    questions.push(...page.data);
+    cursor = page.next_cursor;
+  } while (cursor);
+  return questions;
+};
+
+const toQuestion = (q: QuestionPublic): Question => ({
+  ...q,
+  userName: q.user_name,
+  likes: q.like_count || 0,
+} as unknown as Question);
+
 const useEventData = (eventId: string) => {
   const [event, setEvent] = useState<EventDetails | null>(null);
   const [mainQuestions, setMainQuestions] = useState<Question[]>([]);
@@ -28,25 +54,21 @@ const useEventData = (eventId: string) => {
   const [isLoading, setIsLoading] = useState(true);
   const toast = useToast();
 
+  // The questions come with the websocket snapshot, no listing is fetched
+  const applySnapshot = useCallback((questions: QuestionPublic[]) => {
+    const all = questions.map(q => ({ ...toQuestion(q), parentId: q.parent_id }) as Question);
+    // The snapshot comes oldest first, the page shows the newest first
+    all.reverse();
+    setMainQuestions(all.filter(q => !q.parentId));
+    setFollowupQuestions(all.filter(q => q.parentId));
+  }, []);
+
   useEffect(() => {
-    const fetchEventAndQuestions = async () => {
+    const fetchEvent = async () => {
       try {
         setIsLoading(true);
-        const [eventResponse, questionsResponse] = await Promise.all([
-          EventsService.getEvent({ id: eventId }),
-          QuestionsService.listQuestions({
-            eventId: eventId,
-            sortBy: "created_at",
-            order: "desc",
-          })
-        ]);
-
+        const eventResponse = await EventsService.getEvent({ id: eventId });
         setEvent(eventResponse as unknown as EventDetails);
-        setMainQuestions((questionsResponse.data as any[]).map(q => ({
-          ...q,
-          userName: q.user_name,
-          likes: q.like_count || 0,
-        })));
       } catch (error) {
         console.error("Error fetching data:", error);
         toast({
@@ -61,43 +83,114 @@ const useEventData = (eventId: string) => {
     };
 
     if (eventId) {
-      fetchEventAndQuestions();
+      fetchEvent();
     }
   }, [eventId, toast]);
 
-  return { event, mainQuestions, setMainQuestions, followupQuestions, setFollowupQuestions, isLoading };
+  return { event, mainQuestions, setMainQuestions, followupQuestions, setFollowupQuestions, applySnapshot, isLoading };
 };
 
+// Reconnect delays after unexpected closes, backing off up to the last one
+const RECONNECT_DELAYS = [1000, 2000, 5000, 10000, 30000];
+// The server sends a heartbeat every 15 s, a socket silent for longer than
+// a couple of them is dead even if it wasn't closed
+const SILENCE_TIMEOUT = 40000;
+
 const useWebSocket = (eventId: string, onMessage: (message: any) => void) => {
   useEffect(() => {
     if (!eventId) return;
 
     const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
     const host = window.location.host;
-    const wsUrl = `${protocol}//${host}/api/v1/ws/events/${eventId}`;
+    // Replaced by the URL of the worker serving the event when redirected
+    let baseUrl = `${protocol}//${host}/api/v1/ws/events/${eventId}`;
 
-    const ws = new WebSocket(wsUrl);
+    // Where the stream is at, to get only the missed deltas on reconnect
+    let epoch: string | null = null;
+    let seq = 0;
+    let ws: WebSocket;
     let heartbeatInterval: NodeJS.Timeout;
-
-    ws.onopen = () => {
-      heartbeatInterval = setInterval(() => {
-        if (ws.readyState === WebSocket.OPEN) {
-          ws.send('ping');
+    let reconnectTimeout: NodeJS.Timeout;
+    let silenceTimeout: NodeJS.Timeout;
+    let attempts = 0;
+    let closed = false;
+    let redirected = false;
+
+    const connect = () => {
+      const wsUrl = epoch ? `${baseUrl}?since=${seq}&epoch=${epoch}` : baseUrl;
+      ws = new WebSocket(wsUrl);
+      const socket = ws;
+
+      const resetSilenceTimeout = () => {
+        clearTimeout(silenceTimeout);
+        silenceTimeout = setTimeout(() => socket.close(4000, 'No heartbeat'), SILENCE_TIMEOUT);
+      };
+
+      socket.onopen = () => {
+        resetSilenceTimeout();
+        heartbeatInterval = setInterval(() => {
+          if (socket.readyState === WebSocket.OPEN) {
+            socket.send('ping');
+          }
+        }, 30000);
+      };
+
+      socket.onmessage = (event) => {
+        resetSilenceTimeout();
+        if (event.data === 'pong') return;
+        try {
+          const message = JSON.parse(event.data);
+          if (message.type === 'redirect') {
+            // The server closes the socket right after, reconnect there
+            baseUrl = message.url;
+            attempts = 0;
+            redirected = true;
+            return;
+          }
+          // Only now connected for good, a full event accepts the socket
+          // before closing it with 1013
+          attempts = 0;
+          if (message.type === 'heartbeat') return;
+          if (message.type === 'resync') {
+            // Deltas were dropped, resume from the last one received
+            socket.close(1000, 'Resync');
+            return;
+          }
+          if (message.type === 'snapshot') {
+            epoch = message.epoch;
+            seq = message.seq;
+          } else if (message.seq !== undefined) {
+            // Already in the snapshot or replayed twice
+            if (message.seq <= seq) return;
+            seq = message.seq;
+          }
+          onMessage(message);
+        } catch (error) {
+          console.error('Error processing WebSocket message:', error);
+        }
+      };
+
+      socket.onclose = () => {
+        clearInterval(heartbeatInterval);
+        clearTimeout(silenceTimeout);
+        if (closed) return;
+        if (redirected) {
+          redirected = false;
+          connect();
+          return;
         }
-      }, 30000);
+        const delay = RECONNECT_DELAYS[Math.min(attempts, RECONNECT_DELAYS.length - 1)];
+        attempts += 1;
+        reconnectTimeout = setTimeout(connect, delay);
+      };
     };
 
-    ws.onmessage = (event) => {
-      if (event.data === 'pong') return;
-      try {
-        const message = JSON.parse(event.data);
-        onMessage(message);
-      } catch (error) {
-        console.error('Error processing WebSocket message:', error);
-      }
-    };
+    connect();
 
     return () => {
+      closed = true;
+      clearTimeout(reconnectTimeout);
+      clearTimeout(silenceTimeout);
       clearInterval(heartbeatInterval);
       ws.close(1000, 'Component unmounting');
     };
@@ -132,10 +225,18 @@ function Events() {
     setMainQuestions,
     followupQuestions,
     setFollowupQuestions,
+    applySnapshot,
     isLoading
   } = useEventData(eventId);
 
   const handleWebSocketMessage = useCallback((message: any) => {
+    if (message.type === 'snapshot') {
+      applySnapshot(message.data.questions);
+      return;
+    }
+    // The other messages without data (heartbeats) aren't question changes
+    if (!message.data) return;
+
     const processedQuestion = {
       ...message.data,
       userName: message.data.user_name,
@@ -161,17 +262,24 @@ function Events() {
         break;
 
       case 'question_updated':
-      case 'question_liked':
-        setMainQuestions(prev =>
-          prev.map(q =>
-            q.id === processedQuestion.id
-              ? { ...q, ...processedQuestion }
-              : q
-          )
-        );
+      case 'question_liked': {
+        // Only the fields sent changed, a count update carries no like_count
+        const changes: Record<string, any> = { ...message.data };
+        if (message.data.user_name !== undefined) changes.userName = message.data.user_name;
+        if (message.data.like_count !== undefined) changes.likes = message.data.like_count;
+        const apply = (prev: Question[]) =>
+          prev.map(q => (q.id === message.data.id ? { ...q, ...changes } : q));
+        setMainQuestions(apply);
+        setFollowupQuestions(apply);
+        break;
+      }
+
+      case 'question_deleted':
+        setMainQuestions(prev => prev.filter(q => q.id !== message.data.id));
+        setFollowupQuestions(prev => prev.filter(q => q.id !== message.data.id));
         break;
     }
-  }, [setMainQuestions, setFollowupQuestions]);
+  }, [setMainQuestions, setFollowupQuestions, applySnapshot]);
 
   useWebSocket(eventId, handleWebSocketMessage);
 
@@ -246,7 +354,7 @@ function Events() {
     if (loadedFollowUps >= question.followup_count) return;
 
     try {
-      const response = await QuestionsService.listQuestions({
+      const followUps = await listAllQuestions({
         eventId: eventId,
         parentId: questionId,
         sortBy: "created_at",
@@ -254,7 +362,7 @@ function Events() {
       });
 
       setFollowupQuestions(prev => [...prev,
-        ...(response.data as any[]).map(q => ({
+        ...(followUps as any[]).map(q => ({
           ...q,
           userName: q.user_name,
           parentId: questionId